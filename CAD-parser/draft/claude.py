@@ -1,17 +1,41 @@
+import os
+import sys
 import ezdxf
 import re
+import numpy as np
 import pandas as pd
-from ezdxf.math import Vec2
+from collections import defaultdict
+from ezdxf.addons import iterdxf
+from ezdxf.filemanagement import dxf_file_info
+from ezdxf.lldxf.validator import is_binary_dxf_file
+
+# The drafts share the helpers of the audit scripts one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dxf_utils import measure_rings, upper_layer
+
 
 class ProfessionalPermitAuditor:
+    # MTEXT formatting codes (\A1; \C1; \H0.5x; ...), paragraph breaks and grouping braces in one pass
+    MTEXT_CODE_PATTERN = re.compile(r'\\[A-Za-z][^;]*;|\\P|[{}]')
+    # Files above this size are streamed entity by entity instead of loaded as a full document
+    STREAMING_THRESHOLD = 100 * 1024 * 1024
+
     def __init__(self, file_path):
         try:
-            self.doc = ezdxf.readfile(file_path)
-            self.msp = self.doc.modelspace()
+            self.file_path = file_path
+            # iterdxf only reads ASCII DXF, so binary files are always loaded as a whole
+            if os.path.getsize(file_path) > self.STREAMING_THRESHOLD and not is_binary_dxf_file(file_path):
+                # Only $INSUNITS is needed from the header; entities are streamed in _entities()
+                self.doc = self.msp = None
+                units = dxf_file_info(file_path).insert_units
+            else:
+                self.doc = ezdxf.readfile(file_path)
+                self.msp = self.doc.modelspace()
+                units = self.doc.header.get('$INSUNITS', 4)
             
             # [Fix 4] CRITICAL Unit Validation: Ensure drawing is in mm (Korean standard)
             # $INSUNITS: 0=Unitless, 1=Inches, 4=Millimeters, 6=Meters
-            self.units = self.doc.header.get('$INSUNITS', 4)
+            self.units = units
             
             if self.units not in [0, 4]:
                 raise ValueError(
@@ -35,87 +59,126 @@ class ProfessionalPermitAuditor:
         """[Fix 3] FIXED: Improved Regex for Article 11 Compliance (Material Specs)"""
         # Remove AutoCAD MTEXT formatting codes: \A1; \C1; \H0.5x; \W0.8; \F|fontname; etc.
         # CRITICAL FIX: Changed [A-Zaz0-9] → [A-Za-z0-9] (regex bug fixed)
-        text = re.sub(r'\\[A-Za-z][^;]*;', '', text)  # Remove formatting with semicolons
-        text = re.sub(r'\\P', ' ', text)  # Paragraph breaks → spaces
-        text = re.sub(r'[{}]', '', text)  # Remove grouping braces
+        # Formatting with semicolons and grouping braces are removed, paragraph breaks → spaces
+        text = self.MTEXT_CODE_PATTERN.sub(lambda m: ' ' if m.group(0) == '\\P' else '', text)
         text = ' '.join(text.split())  # Normalize whitespace
         return text.strip()
 
-    def get_precise_area(self, entity):
-        """[Fix 1] Robust Area Extraction with Closed Validation & Multi-Entity Support"""
+    def ring_vertices(self, entity):
+        """Closed LWPOLYLINE/POLYLINE outline as an (N, 2) array, or None if it cannot bound an area"""
         try:
             if entity.dxftype() == 'LWPOLYLINE':
                 # CRITICAL: Building footprints MUST be closed for legal area calculations
                 if not entity.closed:
-                    return 0.0
-                
-                # Use native .area property if available (ezdxf 1.1+)
-                if hasattr(entity, 'area'):
-                    return abs(entity.area) / self.scale_factor
-                else:
-                    # Fallback for older ezdxf versions
-                    vertices = [Vec2(v[:2]) for v in entity.get_points()]
-                    if len(vertices) >= 3:
-                        return abs(ezdxf.math.area(vertices)) / self.scale_factor
-                    
-            elif entity.dxftype() == 'POLYLINE':
+                    return None
+                vertices = np.asarray(entity.get_points('xy'), dtype=np.float64)
+            else:
                 if hasattr(entity, 'is_closed') and not entity.is_closed:
-                    return 0.0
-                vertices = [Vec2(v.dxf.location[:2]) for v in entity.vertices]
-                if len(vertices) >= 3:
-                    return abs(ezdxf.math.area(vertices)) / self.scale_factor
-                    
-            elif entity.dxftype() == 'CIRCLE':
-                radius = entity.dxf.radius
-                return (3.14159265359 * radius ** 2) / self.scale_factor
-                
-            elif entity.dxftype() == 'HATCH':
-                return sum(abs(p.area) for p in entity.paths if hasattr(p, 'area')) / self.scale_factor
-                
-            return 0.0
-            
-        except (AttributeError, ValueError, IndexError) as e:
-            # Log specific errors for debugging but don't crash
-            # print(f"Warning: Area calculation failed for {entity.dxftype()}: {e}")
+                    return None
+                vertices = np.asarray([v.dxf.location[:2] for v in entity.vertices], dtype=np.float64)
+        except (AttributeError, ValueError, IndexError):
+            return None
+        return vertices if len(vertices) >= 3 else None
+
+    def hatch_area(self, entity):
+        """[Fix 1] HATCH area in m² from its boundary paths, 0.0 if they cannot be measured"""
+        try:
+            return sum(abs(p.area) for p in entity.paths if hasattr(p, 'area')) / self.scale_factor
+        except (AttributeError, ValueError, IndexError):
             return 0.0
 
-    def audit(self):
-        area_data = []
+    def _entities(self, types):
+        """Modelspace entities of the given space-separated types, streamed from disk for large files"""
+        if self.msp is None:
+            # Filter here: iterdxf's own `types` filter breaks on skipped INSERT/ATTRIB/SEQEND runs
+            wanted = set(types.split())
+            return (e for e in iterdxf.modelspace(self.file_path) if e.dxftype() in wanted)
+        return self.msp.query(types)
+
+    def _scan_modelspace(self):
+        """Layer names and m² areas of every area-bearing entity as parallel arrays, plus the raw texts"""
+        # Pack every closed outline into one vertex buffer so the shoelace
+        # sum runs once over the whole drawing instead of per entity
+        ring_layers, rings = [], []
+        circle_layers, radii = [], []
+        hatch_layers, hatch_areas = [], []
+        # Drawings repeat the same labels many times, so each distinct string is kept once
+        raw_texts = set()
+
+        def add_ring(entity, layer):
+            vertices = self.ring_vertices(entity)
+            if vertices is not None:
+                ring_layers.append(layer)
+                rings.append(vertices)
+
+        def add_circle(entity, layer):
+            circle_layers.append(layer)
+            radii.append(entity.dxf.radius)
+
+        def add_hatch(entity, layer):
+            hatch_layers.append(layer)
+            hatch_areas.append(self.hatch_area(entity))
+
+        def add_text(entity, layer):
+            raw_texts.add(entity.plain_text() if hasattr(entity, 'plain_text') else "")
+
+        collect = {'LWPOLYLINE': add_ring, 'POLYLINE': add_ring, 'CIRCLE': add_circle, 'HATCH': add_hatch,
+                   'TEXT': add_text, 'MTEXT': add_text}
+        # One pass for geometry and texts alike, so a streamed file is only read once
+        for entity in self._entities('LWPOLYLINE POLYLINE CIRCLE HATCH TEXT MTEXT'):
+            collect[entity.dxftype()](entity, upper_layer(entity.dxf.layer))
+
+        ring_areas = measure_rings(rings) / self.scale_factor
+        circle_areas = np.pi * np.asarray(radii, dtype=np.float64) ** 2 / self.scale_factor
+
+        layers = np.asarray(ring_layers + circle_layers + hatch_layers, dtype=object)
+        areas = np.concatenate([ring_areas, circle_areas, np.asarray(hatch_areas, dtype=np.float64)])
+        return layers, areas, raw_texts
+
+    def _collect_materials(self, raw_texts, keywords):
+        """Cleaned texts mentioning any of the material keywords"""
+        # One alternation pattern scans each string once instead of one substring search per keyword
+        keyword_pattern = re.compile('|'.join(map(re.escape, keywords)))
         materials = set()
-        
+        for raw in raw_texts:
+            content = self.clean_legal_text(raw)
+            if keyword_pattern.search(content):
+                materials.add(content)
+        return materials
+
+    def audit(self):
         # Extended keywords for fire safety/insulation [cite: 10, 24, 30]
         keywords = ["마감", "유리", "콘크리트", "THK", "단열재", "방수", "내화", "난연"]
 
-        for entity in self.msp:
-            # Area Audit
-            area = self.get_precise_area(entity)
-            if area > 0:
-                area_data.append({'layer': entity.dxf.layer.upper(), 'area': area})
-            
-            # Material Audit [cite: 10, 29]
-            if entity.dxftype() in ['TEXT', 'MTEXT']:
-                raw = entity.plain_text() if hasattr(entity, 'plain_text') else ""
-                content = self.clean_legal_text(raw)
-                if any(kw in content for kw in keywords):
-                    materials.add(content)
-
-        if not area_data:
+        # Area Audit
+        layers, areas, raw_texts = self._scan_modelspace()
+        valid = areas > 0
+
+        # Material Audit [cite: 10, 29]
+        materials = self._collect_materials(raw_texts, keywords)
+
+        if not valid.any():
             raise ValueError("No valid closed polylines found in DXF file")
             
-        df = pd.DataFrame(area_data)
+        # Per-layer accumulators answer every lookup below without a DataFrame
+        layer_sum = defaultdict(float)
+        layer_max = defaultdict(float)
+        for layer, area in zip(layers[valid], areas[valid].tolist()):
+            layer_sum[layer] += area
+            layer_max[layer] = max(layer_max[layer], area)
         
         # [Fix 2] ENHANCED: Priority Logic for Site and Building (Article 55 Compliance)
         site_area = 0.0
         site_layer_found = None
         for s_layer in self.SITE_LAYERS:
-            if s_layer in df['layer'].values:
-                site_area = df[df['layer'] == s_layer]['area'].max()
+            if s_layer in layer_max:
+                site_area = layer_max[s_layer]
                 site_layer_found = s_layer
                 break
         
         # Fallback: Use largest area if no standard layer found
         if site_area == 0.0:
-            site_area = df['area'].max()
+            site_area = max(layer_max.values())
             print(f"⚠ Warning: No standard site layer found. Using largest area: {site_area:.2f} m²")
         else:
             print(f"✓ Site boundary detected: Layer '{site_layer_found}' = {site_area:.2f} m²")
@@ -123,14 +186,14 @@ class ProfessionalPermitAuditor:
         bldg_area = 0.0
         bldg_layer_found = None
         for b_layer in self.BLDG_LAYERS:
-            if b_layer in df['layer'].values:
-                bldg_area = df[df['layer'] == b_layer]['area'].sum()  # Handle multi-building
+            if b_layer in layer_sum:
+                bldg_area = layer_sum[b_layer]  # Handle multi-building
                 bldg_layer_found = b_layer
                 break
         
         # [Fix 4] CRITICAL: Error if building footprint not found
         if bldg_area == 0.0:
-            available_layers = ', '.join(df['layer'].unique())
+            available_layers = ', '.join(layer_sum)
             raise ValueError(
                 f"Cannot identify building footprint layer. Expected one of {self.BLDG_LAYERS}, "
                 f"but found: {available_layers}"
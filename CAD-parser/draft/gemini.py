@@ -1,33 +1,38 @@
+import os
+import sys
 import ezdxf
 import re
-from ezdxf.math import Vec2
+
+# The drafts share the helpers of the audit scripts one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dxf_utils import polygon_area, upper_layer
+
 
 class BuildingPermitAuditor:
+    MTEXT_CODE_PATTERN = re.compile(r"\\[A-Zaz0-9].*?;")
+
     def __init__(self, file_path):
         self.doc = ezdxf.readfile(file_path)
         self.msp = self.doc.modelspace()
         self.material_keywords = ["마감", "유리", "석재", "타일", "벽지", "콘크리트", "THK"]
+        self.material_pattern = re.compile("|".join(map(re.escape, self.material_keywords)))
 
     def clean_text(self, text):
-        return re.sub(r"\\[A-Zaz0-9].*?;", "", text).replace("\\P", " ").strip()
+        return self.MTEXT_CODE_PATTERN.sub("", text).replace("\\P", " ").strip()
 
     def get_area(self, entity):
-        try:
-            if entity.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                vertices = [Vec2(v[:2]) for v in entity.get_points()]
-                if len(vertices) >= 3:
-                    return abs(ezdxf.math.area(vertices))
-            return 0.0
-        except:
-            return 0.0
+        # LWPOLYLINE only: POLYLINE never produced an area here
+        if entity.dxftype() == 'LWPOLYLINE':
+            return polygon_area(entity.get_points('xy'))
+        return 0.0
 
     def generate_legal_report(self):
         data = {"site_area": 0.0, "building_area": 0.0, "materials": set()}
         
-        for entity in self.msp:
-            # Area Categorization
+        # Area Categorization
+        for entity in self.msp.query('LWPOLYLINE'):
             area = self.get_area(entity)
-            layer = entity.dxf.layer.upper()
+            layer = upper_layer(entity.dxf.layer)
             
             if area > 0:
                 if layer == "ETC": # Assuming ETC is site boundary per previous results
@@ -35,11 +40,11 @@ class BuildingPermitAuditor:
                 elif layer == "HH": # Primary building footprint
                     data["building_area"] = max(data["building_area"], area)
 
-            # Material Audit
-            if entity.dxftype() in ['TEXT', 'MTEXT']:
-                content = self.clean_text(entity.plain_text() if hasattr(entity, 'plain_text') else entity.dxf.text)
-                if any(kw in content for kw in self.material_keywords):
-                    data["materials"].add(content)
+        # Material Audit
+        for entity in self.msp.query('TEXT MTEXT'):
+            content = self.clean_text(entity.plain_text() if hasattr(entity, 'plain_text') else entity.dxf.text)
+            if self.material_pattern.search(content):
+                data["materials"].add(content)
 
         # Ratio Calculation
         ratio = (data["building_area"] / data["site_area"] * 100) if data["site_area"] > 0 else 0
@@ -1,47 +1,53 @@
+import csv
+import os
+import sys
 import ezdxf
 import re
-import pandas as pd
-from ezdxf.math import Vec2
+
+# The drafts share the helpers of the audit scripts one directory up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dxf_utils import polygon_area
+
 
 class BuildingComplianceApp:
+    MTEXT_CODE_PATTERN = re.compile(r"\\[A-Zaz0-9].*?;")
+    MATERIAL_PATTERN = re.compile("마감|유리|콘크리트|THK")
+
     def __init__(self, file_path):
         self.doc = ezdxf.readfile(file_path)
         self.msp = self.doc.modelspace()
         
     def get_area(self, entity):
-        try:
-            if entity.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                vertices = [Vec2(v[:2]) for v in entity.get_points()]
-                if len(vertices) >= 3:
-                    # mm^2 to m^2 conversion (1,000,000 mm^2 = 1 m^2)
-                    return abs(ezdxf.math.area(vertices)) / 1_000_000
-            return 0.0
-        except:
-            return 0.0
+        # POLYLINE has no get_points(), so only LWPOLYLINE ever yielded an area
+        if entity.dxftype() == 'LWPOLYLINE':
+            # mm^2 to m^2 conversion (1,000,000 mm^2 = 1 m^2)
+            return polygon_area(entity.get_points('xy')) / 1_000_000
+        return 0.0
 
     def run_audit(self):
-        all_areas = []
+        site_area = 0.0
+        building_area = None
         materials = []
 
-        for entity in self.msp:
-            # 1. Extract Geometry
+        # 1. Extract Geometry: a running maximum and the first HH outline are all the report needs
+        for entity in self.msp.query('LWPOLYLINE'):
             area = self.get_area(entity)
             if area > 0:
-                all_areas.append({'layer': entity.dxf.layer, 'area_m2': area})
-            
-            # 2. Extract Materials
-            if entity.dxftype() in ['TEXT', 'MTEXT']:
-                content = entity.plain_text() if hasattr(entity, 'plain_text') else ""
-                content = re.sub(r"\\[A-Zaz0-9].*?;", "", content).replace("\\P", " ").strip()
-                if any(kw in content for kw in ["마감", "유리", "콘크리트", "THK"]):
-                    materials.append(content)
-
-        # LOGIC: Largest area is usually the Site
-        df_areas = pd.DataFrame(all_areas)
-        site_area = df_areas['area_m2'].max()
-        
-        # LOGIC: HH is the building footprint
-        building_area = df_areas[df_areas['layer'] == 'HH']['area_m2'].iloc[0] if 'HH' in df_areas['layer'].values else 0
+                # LOGIC: Largest area is usually the Site
+                site_area = max(site_area, area)
+                # LOGIC: HH is the building footprint
+                if building_area is None and entity.dxf.layer == 'HH':
+                    building_area = area
+
+        # 2. Extract Materials
+        for entity in self.msp.query('TEXT MTEXT'):
+            content = entity.plain_text() if hasattr(entity, 'plain_text') else ""
+            content = self.MTEXT_CODE_PATTERN.sub("", content).replace("\\P", " ").strip()
+            if self.MATERIAL_PATTERN.search(content):
+                materials.append(content)
+
+        if building_area is None:
+            building_area = 0
         
         # Calculate Building-to-Land Ratio
         btl_ratio = (building_area / site_area * 100) if site_area > 0 else 0
@@ -51,7 +57,10 @@ class BuildingComplianceApp:
             "Metric": ["Site Area (m2)", "Building Area (m2)", "Building-to-Land Ratio (%)", "Material Specs Found"],
             "Value": [f"{site_area:.2f}", f"{building_area:.2f}", f"{btl_ratio:.2f}%", len(set(materials))]
         }
-        pd.DataFrame(report_data).to_csv("building_compliance_report.csv", index=False)
+        with open("building_compliance_report.csv", "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(report_data.keys())
+            writer.writerows(zip(*report_data.values()))
         
         return report_data, sorted(list(set(materials)))
 
@@ -1,7 +1,10 @@
 import pandas as pd
+import numpy as np
 import math
+from array import array
+from typing import Any, Dict, List
 
-def parse_dxf(file_path: str) -> Dict[str, Any]:
+def parse_dxf(file_path: str, keep_raw: bool = False) -> Dict[str, Any]:
     """
     Improved DXF parser with error handling for conversions: Reads DXF file, handles repeated group codes by storing as list of tuples.
     Parses common entities (LINE, CIRCLE, ARC, TEXT/MTEXT, LWPOLYLINE, POLYLINE with VERTEX/SEQEND, DIMENSION, VIEWPORT).
@@ -9,74 +12,96 @@ def parse_dxf(file_path: str) -> Dict[str, Any]:
     
     Args:
         file_path (str): Path to the ASCII DXF file.
+        keep_raw (bool): Also attach each entity's group code/value pairs as 'raw_pairs'.
     
     Returns:
         Dict[str, Any]: {'header': dict, 'entities': pd.DataFrame, 'computed': dict with totals}.
     """
     try:
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = [line.strip() for line in f if line.strip()]
+            text = f.read()
     except UnicodeDecodeError:
         with open(file_path, 'r', encoding='ascii', errors='ignore') as f:
-            lines = [line.strip() for line in f if line.strip()]
+            text = f.read()
     except FileNotFoundError:
         return {'error': 'File not found'}
     except Exception as e:
         return {'error': str(e)}
 
-    i = 0
+    # Tokenize the whole file at once into parallel code/value columns; a
+    # trailing unpaired line is dropped just like the old pair walk did.
+    lines = list(filter(None, map(str.strip, text.split('\n'))))
+    del lines[len(lines) - len(lines) % 2:]
+    pairs = np.array(lines, dtype=object).reshape(-1, 2)
+    codes = pairs[:, 0]
+    values = pairs[:, 1]
+    zero_positions = np.flatnonzero(codes == '0').tolist()
+    bounds = zero_positions[1:] + [len(codes)]
+
     header = {}
     entities_list = []
     current_section = None
     buffer = []  # List to collect code-value pairs for current entity/section
 
-    while i < len(lines):
-        if i + 1 >= len(lines):
-            break
-        code = lines[i]
-        value = lines[i + 1]
+    def record_pairs(start, stop):
+        return list(zip(codes[start:stop].tolist(), values[start:stop].tolist()))
 
-        if code == '0':
-            if value == 'SECTION':
-                if current_section == 'HEADER':
-                    header = process_header(buffer)
-                elif current_section == 'ENTITIES':
-                    entities_list.extend(process_entities(buffer))
-                buffer = []
-                i += 2
-                if i < len(lines) and lines[i] == '2':
-                    current_section = lines[i + 1]
-                i += 2
-                continue
-            elif value == 'ENDSEC':
-                if current_section == 'HEADER':
-                    header = process_header(buffer)
-                elif current_section == 'ENTITIES':
-                    entities_list.extend(process_entities(buffer))
-                buffer = []
+    # Pairs ahead of the first group code 0 sit outside any section and are
+    # never buffered, so the state machine only has to visit record starts.
+    for start, stop in zip(zero_positions, bounds):
+        value = values[start]
+        if value == 'SECTION' or value == 'ENDSEC':
+            if current_section == 'HEADER':
+                header = process_header(buffer)
+            elif current_section == 'ENTITIES':
+                entities_list.extend(process_entities(buffer, keep_raw))
+            buffer = []
+            if value == 'ENDSEC':
                 current_section = None
-                i += 2
-                continue
-            else:
-                if buffer:
-                    entities_list.extend(process_entities(buffer))
-                buffer = [(code, value)]
-                i += 2
                 continue
+            if start + 1 < stop and codes[start + 1] == '2':
+                current_section = values[start + 1]
+            if current_section:
+                buffer = record_pairs(start + 2, stop)
+            continue
 
+        if buffer:
+            entities_list.extend(process_entities(buffer, keep_raw))
+        buffer = [('0', value)]
         if current_section:
-            buffer.append((code, value))
-        i += 2
+            buffer.extend(record_pairs(start + 1, stop))
 
     if buffer:
-        entities_list.extend(process_entities(buffer))
+        entities_list.extend(process_entities(buffer, keep_raw))
 
-    df = pd.DataFrame(entities_list)
+    df = build_entity_frame(entities_list)
+    # Measures are float64 from here on, so aggregation never meets object cells
+    for col in ('area', 'length', 'scale', 'radius'):
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    fill_curve_measures(df)
 
     computed = compute_aggregates(df)
 
     return {'header': header, 'entities': df, 'computed': computed}
 
+def build_entity_frame(entities: List[Dict]) -> pd.DataFrame:
+    """Build the entity table column by column, one block per entity shape."""
+    # Entities from the same extractor share their keys (TEXT and MTEXT
+    # included), so grouping on the key tuple keeps each block homogeneous.
+    # Each block remembers the file positions of its rows so that the
+    # concatenated table can be put back into file order.
+    blocks = {}
+    for pos, ent in enumerate(entities):
+        positions, ents = blocks.setdefault(tuple(ent), ([], []))
+        positions.append(pos)
+        ents.append(ent)
+    frames = [pd.DataFrame({key: [ent[key] for ent in ents] for key in keys}, index=positions)
+              for keys, (positions, ents) in blocks.items()]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames).sort_index().reset_index(drop=True)
+
 def process_header(buffer: List[tuple]) -> Dict:
     head = {}
     for code, value in buffer:
@@ -88,77 +113,76 @@ def process_header(buffer: List[tuple]) -> Dict:
             head[code].append(value)
     return head
 
-def process_entities(buffer: List[tuple]) -> List[Dict]:
+def process_entities(buffer: List[tuple], keep_raw: bool = False) -> List[Dict]:
     entities = []
     current_polyline = None
-    i = 0
-    while i < len(buffer):
-        code, value = buffer[i]
-        if code == '0':
-            if value == 'POLYLINE':
-                current_polyline = {'type': 'POLYLINE', 'vertices': [], 'layer': '0', 'flag': 0, 'raw_pairs': []}
-                j = i + 1
-                while j < len(buffer) and buffer[j][0] != '0':
-                    c, v = buffer[j]
-                    current_polyline['raw_pairs'].append((c, v))
-                    if c == '8':
-                        current_polyline['layer'] = v
-                    elif c == '70':
-                        try:
-                            current_polyline['flag'] = int(v)
-                        except ValueError:
-                            pass
-                    j += 1
-                i = j
-                continue
-            elif value == 'VERTEX' and current_polyline:
-                j = i + 1
-                vertex_buffer = [(code, value)]
-                while j < len(buffer) and buffer[j][0] != '0':
-                    vertex_buffer.append(buffer[j])
-                    j += 1
-                vertex = extract_vertex(vertex_buffer)
-                if vertex:
-                    current_polyline['vertices'].append(vertex['position'])
-                i = j
-                continue
-            elif value == 'SEQEND' and current_polyline:
-                if current_polyline['flag'] & 1 and current_polyline['vertices']:
-                    current_polyline['area'] = shoelace_area(current_polyline['vertices'])
-                entities.append(current_polyline)
-                current_polyline = None
-                i += 1
-                continue
-            else:
-                j = i + 1
-                ent_buffer = [(code, value)]
-                while j < len(buffer) and buffer[j][0] != '0':
-                    ent_buffer.append(buffer[j])
-                    j += 1
-                ent_type = value
-                if ent_type:
-                    ent = None
-                    if ent_type == 'LINE':
-                        ent = extract_line(ent_buffer)
-                    elif ent_type == 'CIRCLE':
-                        ent = extract_circle(ent_buffer)
-                    elif ent_type == 'ARC':
-                        ent = extract_arc(ent_buffer)
-                    elif ent_type in ['TEXT', 'MTEXT']:
-                        ent = extract_text(ent_buffer)
-                    elif ent_type == 'LWPOLYLINE':
-                        ent = extract_lwpolyline(ent_buffer)
-                    elif ent_type == 'DIMENSION':
-                        ent = extract_dimension(ent_buffer)
-                    elif ent_type == 'VIEWPORT':
-                        ent = extract_viewport(ent_buffer)
-                    if ent:
-                        entities.append(ent)
-                i = j
-                continue
-        i += 1
+    vertex_columns = None
+    # Find every record start once; each entity is then the slice up to the
+    # next start instead of being re-scanned pair by pair.
+    starts = [k for k, (code, _) in enumerate(buffer) if code == '0']
+    for start, stop in zip(starts, starts[1:] + [len(buffer)]):
+        value = buffer[start][1]
+        if value == 'POLYLINE':
+            current_polyline = {'type': 'POLYLINE', 'vertices': None, 'layer': '0', 'flag': 0, 'area': 0.0}
+            vertex_columns = (array('d'), array('d'), array('d'))
+            if keep_raw:
+                current_polyline['raw_pairs'] = buffer[start + 1:stop]
+            for c, v in buffer[start + 1:stop]:
+                if c == '8':
+                    current_polyline['layer'] = v
+                elif c == '70':
+                    try:
+                        current_polyline['flag'] = int(v)
+                    except ValueError:
+                        pass
+        elif value == 'VERTEX' and current_polyline:
+            vertex = extract_vertex(buffer[start:stop])
+            if vertex:
+                for column, coord in zip(vertex_columns, vertex['position']):
+                    column.append(coord)
+        elif value == 'SEQEND' and current_polyline:
+            current_polyline['vertices'] = stack_vertices(*vertex_columns)
+            if current_polyline['flag'] & 1 and len(current_polyline['vertices']):
+                current_polyline['area'] = shoelace_area(current_polyline['vertices'][:, :2])
+            entities.append(current_polyline)
+            current_polyline = None
+        elif value:
+            ent_buffer = buffer[start:stop]
+            ent = None
+            if value == 'LINE':
+                ent = extract_line(ent_buffer)
+            elif value == 'CIRCLE':
+                ent = extract_circle(ent_buffer)
+            elif value == 'ARC':
+                ent = extract_arc(ent_buffer)
+            elif value in TEXT_TYPES:
+                ent = extract_text(ent_buffer)
+            elif value == 'LWPOLYLINE':
+                ent = extract_lwpolyline(ent_buffer)
+            elif value == 'DIMENSION':
+                ent = extract_dimension(ent_buffer)
+            elif value == 'VIEWPORT':
+                ent = extract_viewport(ent_buffer)
+            if ent:
+                if keep_raw:
+                    ent['raw_pairs'] = ent_buffer
+                entities.append(ent)
     return entities
 
+# Group codes each extractor reads; later duplicates overwrite earlier ones.
+LINE_CODES = frozenset({'8', '10', '20', '30', '11', '21', '31'})
+CIRCLE_CODES = frozenset({'8', '10', '20', '30', '40'})
+ARC_CODES = frozenset({'8', '10', '20', '30', '40', '50', '51'})
+TEXT_CODES = frozenset({'8', '10', '20', '30', '40', '1', '3'})
+VERTEX_CODES = frozenset({'10', '20', '30'})
+DIMENSION_CODES = frozenset({'8', '42'})
+VIEWPORT_CODES = frozenset({'8', '41', '45'})
+LWPOLYLINE_CODES = frozenset({'70', '8'})  # vertex codes are read positionally
+TEXT_TYPES = frozenset({'TEXT', 'MTEXT'})
+
+def pick_codes(buffer: List[tuple], wanted: frozenset) -> Dict[str, str]:
+    return {c: v for c, v in buffer if c in wanted}
+
 def safe_float(v):
     try:
         return float(v)
@@ -166,11 +190,8 @@ def safe_float(v):
         return 0.0  # Default to 0 on error
 
 def extract_line(buffer: List[tuple]) -> Dict:
-    ent = {'type': 'LINE', 'raw_pairs': buffer, 'layer': '0', 'start': (0,0,0), 'end': (0,0,0), 'length': 0.0}
-    codes = {}
-    for c, v in buffer:
-        if c in ['8', '10', '20', '30', '11', '21', '31']:
-            codes[c] = v
+    ent = {'type': 'LINE', 'layer': '0', 'start': (0,0,0), 'end': (0,0,0), 'length': 0.0}
+    codes = pick_codes(buffer, LINE_CODES)
     ent['layer'] = codes.get('8', '0')
     start = (safe_float(codes.get('10')), safe_float(codes.get('20')), safe_float(codes.get('30')))
     end = (safe_float(codes.get('11')), safe_float(codes.get('21')), safe_float(codes.get('31')))
@@ -180,25 +201,18 @@ def extract_line(buffer: List[tuple]) -> Dict:
     return ent
 
 def extract_circle(buffer: List[tuple]) -> Dict:
-    ent = {'type': 'CIRCLE', 'raw_pairs': buffer, 'layer': '0', 'center': (0,0,0), 'radius': 0.0, 'area': 0.0}
-    codes = {}
-    for c, v in buffer:
-        if c in ['8', '10', '20', '30', '40']:
-            codes[c] = v
+    ent = {'type': 'CIRCLE', 'layer': '0', 'center': (0,0,0), 'radius': 0.0, 'area': 0.0}
+    codes = pick_codes(buffer, CIRCLE_CODES)
     ent['layer'] = codes.get('8', '0')
     center = (safe_float(codes.get('10')), safe_float(codes.get('20')), safe_float(codes.get('30')))
     radius = safe_float(codes.get('40'))
     ent['center'] = center
-    ent['radius'] = radius
-    ent['area'] = math.pi * radius ** 2
+    ent['radius'] = radius  # area is filled in for all circles at once by fill_curve_measures
     return ent
 
 def extract_arc(buffer: List[tuple]) -> Dict:
-    ent = {'type': 'ARC', 'raw_pairs': buffer, 'layer': '0', 'center': (0,0,0), 'radius': 0.0, 'start_angle': 0.0, 'end_angle': 0.0, 'length': 0.0}
-    codes = {}
-    for c, v in buffer:
-        if c in ['8', '10', '20', '30', '40', '50', '51']:
-            codes[c] = v
+    ent = {'type': 'ARC', 'layer': '0', 'center': (0,0,0), 'radius': 0.0, 'start_angle': 0.0, 'end_angle': 0.0, 'length': 0.0}
+    codes = pick_codes(buffer, ARC_CODES)
     ent['layer'] = codes.get('8', '0')
     center = (safe_float(codes.get('10')), safe_float(codes.get('20')), safe_float(codes.get('30')))
     radius = safe_float(codes.get('40'))
@@ -207,16 +221,12 @@ def extract_arc(buffer: List[tuple]) -> Dict:
     ent['center'] = center
     ent['radius'] = radius
     ent['start_angle'] = start_angle
-    ent['end_angle'] = end_angle
-    ent['length'] = radius * math.radians(abs(end_angle - start_angle))
+    ent['end_angle'] = end_angle  # length is filled in for all arcs at once by fill_curve_measures
     return ent
 
 def extract_text(buffer: List[tuple]) -> Dict:
-    ent = {'type': buffer[0][1], 'raw_pairs': buffer, 'layer': '0', 'position': (0,0,0), 'content': '', 'height': 0.0}
-    codes = {}
-    for c, v in buffer:
-        if c in ['8', '10', '20', '30', '40', '1', '3']:
-            codes[c] = v
+    ent = {'type': buffer[0][1], 'layer': '0', 'position': (0,0,0), 'content': '', 'height': 0.0}
+    codes = pick_codes(buffer, TEXT_CODES)
     ent['layer'] = codes.get('8', '0')
     position = (safe_float(codes.get('10')), safe_float(codes.get('20')), safe_float(codes.get('30')))
     content = codes.get('1', '') + codes.get('3', '')
@@ -227,13 +237,13 @@ def extract_text(buffer: List[tuple]) -> Dict:
     return ent
 
 def extract_lwpolyline(buffer: List[tuple]) -> Dict:
-    ent = {'type': 'LWPOLYLINE', 'vertices': [], 'layer': '0', 'closed': False, 'raw_pairs': buffer, 'area': 0.0, 'length': 0.0}
+    ent = {'type': 'LWPOLYLINE', 'vertices': [], 'layer': '0', 'closed': False, 'area': 0.0, 'length': 0.0}
     codes = {}
-    vertices = []
+    xs, ys, zs = array('d'), array('d'), array('d')
     k = 0
     while k < len(buffer):
         c, v = buffer[k]
-        if c in ['70', '8']:
+        if c in LWPOLYLINE_CODES:
             codes[c] = v
         if c == '10':
             x = safe_float(v)
@@ -247,7 +257,9 @@ def extract_lwpolyline(buffer: List[tuple]) -> Dict:
             if k < len(buffer) and buffer[k][0] == '30':
                 z = safe_float(buffer[k][1])
                 k += 1
-            vertices.append((x, y, z))
+            xs.append(x)
+            ys.append(y)
+            zs.append(z)
             continue
         k += 1
     ent['layer'] = codes.get('8', '0')
@@ -255,71 +267,79 @@ def extract_lwpolyline(buffer: List[tuple]) -> Dict:
         ent['closed'] = bool(int(codes.get('70', '0')) & 1)
     except ValueError:
         pass
+    vertices = stack_vertices(xs, ys, zs)
     ent['vertices'] = vertices
     if ent['closed'] and len(vertices) >= 3:
-        ent['area'] = shoelace_area(vertices)
-    if vertices:
-        perim = 0.0
-        for idx in range(len(vertices) - 1 if not ent['closed'] else len(vertices)):
-            p1 = vertices[idx]
-            p2 = vertices[(idx + 1) % len(vertices)]
-            perim += math.dist(p1[:2], p2[:2])
-        ent['length'] = perim
+        ent['area'] = shoelace_area(vertices[:, :2])
+    if len(vertices):
+        ent['length'] = polyline_length(vertices[:, :2], ent['closed'])
     return ent
 
 def extract_vertex(buffer: List[tuple]) -> Dict:
-    ent = {'type': 'VERTEX', 'raw_pairs': buffer, 'position': (0,0,0)}
-    codes = {}
-    for c, v in buffer:
-        if c in ['10', '20', '30']:
-            codes[c] = v
+    ent = {'type': 'VERTEX', 'position': (0,0,0)}
+    codes = pick_codes(buffer, VERTEX_CODES)
     position = (safe_float(codes.get('10')), safe_float(codes.get('20')), safe_float(codes.get('30')))
     ent['position'] = position
     return ent
 
 def extract_dimension(buffer: List[tuple]) -> Dict:
-    ent = {'type': 'DIMENSION', 'raw_pairs': buffer, 'layer': '0', 'measurement': 0.0}
-    codes = {}
-    for c, v in buffer:
-        if c in ['8', '42']:
-            codes[c] = v
+    ent = {'type': 'DIMENSION', 'layer': '0', 'measurement': 0.0}
+    codes = pick_codes(buffer, DIMENSION_CODES)
     ent['layer'] = codes.get('8', '0')
     ent['measurement'] = safe_float(codes.get('42'))
     return ent
 
 def extract_viewport(buffer: List[tuple]) -> Dict:
-    ent = {'type': 'VIEWPORT', 'raw_pairs': buffer, 'layer': '0', 'scale': 1.0}
-    codes = {}
-    for c, v in buffer:
-        if c in ['8', '41', '45']:
-            codes[c] = v
+    ent = {'type': 'VIEWPORT', 'layer': '0', 'scale': 1.0}
+    codes = pick_codes(buffer, VIEWPORT_CODES)
     ent['layer'] = codes.get('8', '0')
     h = safe_float(codes.get('41', 1.0))
     w = safe_float(codes.get('45', 1.0))
     ent['scale'] = h / w if w != 0 else 1.0
     return ent
 
-def shoelace_area(vertices: List[tuple]) -> float:
+def stack_vertices(xs: array, ys: array, zs: array) -> np.ndarray:
+    """Pack per-coordinate buffers into one contiguous (n, 3) float64 array."""
+    return np.stack([np.frombuffer(xs), np.frombuffer(ys), np.frombuffer(zs)], axis=1)
+
+def shoelace_area(vertices: np.ndarray) -> float:
     if len(vertices) < 3:
         return 0.0
-    area = 0.0
-    for k in range(len(vertices)):
-        x1, y1, _ = vertices[k]
-        x2, y2, _ = vertices[(k + 1) % len(vertices)]
-        area += x1 * y2 - x2 * y1
-    return abs(area) / 2
+    x, y = vertices[:, 0], vertices[:, 1]
+    area = (x * np.roll(y, -1) - np.roll(x, -1) * y).sum()
+    return float(abs(area) / 2)
+
+def polyline_length(vertices: np.ndarray, closed: bool) -> float:
+    segments = np.diff(vertices, axis=0)
+    if closed:
+        segments = np.vstack([segments, vertices[:1] - vertices[-1:]])
+    return float(np.hypot(segments[:, 0], segments[:, 1]).sum())
+
+def fill_curve_measures(df: pd.DataFrame) -> None:
+    """Set circle areas and arc lengths in place, one array expression per entity type."""
+    if 'type' not in df:
+        return
+    circles = (df['type'] == 'CIRCLE').to_numpy()
+    if circles.any():
+        radius = df.loc[circles, 'radius'].to_numpy()
+        df.loc[circles, 'area'] = math.pi * radius * radius
+    arcs = (df['type'] == 'ARC').to_numpy()
+    if arcs.any():
+        sweep = np.abs(df.loc[arcs, 'end_angle'].to_numpy() - df.loc[arcs, 'start_angle'].to_numpy())
+        df.loc[arcs, 'length'] = df.loc[arcs, 'radius'].to_numpy() * np.deg2rad(sweep)
 
 def compute_aggregates(df: pd.DataFrame) -> Dict:
     computed = {'total_area': 0.0, 'total_length': 0.0, 'scales': [], 'texts': []}
-    for _, row in df.iterrows():
-        if 'area' in row and isinstance(row['area'], (int, float)):
-            computed['total_area'] += row['area']
-        if 'length' in row and isinstance(row['length'], (int, float)):
-            computed['total_length'] += row['length']
-        if 'scale' in row and isinstance(row['scale'], (int, float)):
-            computed['scales'].append(row['scale'])
-        if 'content' in row:
-            computed['texts'].append(row['content'])
+    # Entities without a given measure leave NaN in that column; skip them
+    # rather than letting one LINE turn the whole area total into NaN.
+    if 'area' in df:
+        computed['total_area'] = float(df['area'].sum())
+    if 'length' in df:
+        computed['total_length'] = float(df['length'].sum())
+    if 'scale' in df:
+        computed['scales'] = df['scale'].dropna().tolist()
+    if 'content' in df:
+        computed['texts'] = df.loc[df['type'].isin(['TEXT', 'MTEXT']), 'content'].tolist()
     return computed
 
 # Example usage:
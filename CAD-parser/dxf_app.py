@@ -1,22 +1,37 @@
+import functools
+import os
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import ezdxf
 import matplotlib.pyplot as plt
+import shapely
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import to_rgba_array
 from matplotlib.patches import Rectangle, Polygon as MplPolygon
-from shapely.geometry import LineString, Point, MultiLineString, Polygon, box
-from shapely.ops import polygonize, unary_union, nearest_points
-import networkx as nx
+from shapely.geometry import LineString, Polygon, box
+from shapely.ops import polygonize, unary_union
+from shapely.strtree import STRtree
+import numpy as np
 import re
 import pandas as pd # Import pandas for data handling
-from ezdxf.math import Vec2 # Import Vec2 for area calc
+from dxf_utils import measure_rings, upper_layer
 
 UNIT_TO_METERS = {0: 0.0254, 1: 0.0254, 2: 0.0254, 4: 0.001, 5: 0.01, 6: 1.0}
 EXTENSION_TOLERANCE = 1.5
 
+@functools.lru_cache(maxsize=2)
+def _read_dxf(file_path, mtime):
+    return ezdxf.readfile(file_path)
+
+def load_dxf(file_path):
+    """Parsed document for `file_path`, shared by the layer scan, the auditor and process_dxf.
+    Keyed on the modification time so an edited file is re-read."""
+    return _read_dxf(file_path, os.path.getmtime(file_path))
+
 def get_dxf_layers(file_path):
     try:
-        doc = ezdxf.readfile(file_path)
+        doc = load_dxf(file_path)
         msp = doc.modelspace()
         layers = set()
         for entity in msp.query('LINE LWPOLYLINE'):
@@ -28,51 +43,58 @@ def get_dxf_layers(file_path):
 # --- AUDIT LOGIC (Integrated from fullaudit.py) ---
 class ComplianceAuditor:
     def __init__(self, file_path):
-        self.doc = ezdxf.readfile(file_path)
+        self.doc = load_dxf(file_path)
         self.msp = self.doc.modelspace()
         self.units = self.doc.header.get('$INSUNITS', 4)
         self.scale = 1_000_000 if self.units in [0, 4] else 1.0
         
         self.SITE_KWS = ['지적', 'SITE', '대지', 'LND', 'BOUNDARY']
         self.FOOTPRINT_KWS = ['HH', 'FOOTPRINT', '건축면적']
-        self.FLOOR_PATTERN = re.compile(r'(B?\d+)(F|층|FLR|FLOOR|ND|ST|RD|TH)', re.IGNORECASE)
-
-    def _get_area(self, e):
-        try:
-            if e.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                if hasattr(e, 'area'): return abs(e.area) / self.scale
-                return abs(ezdxf.math.area([Vec2(v[:2]) for v in e.get_points()])) / self.scale
-            return 0.0
-        except: return 0.0
+        self.FLOOR_PATTERN = re.compile(r'(B?\d++)(F|층|FLR|FLOOR|ND|ST|RD|TH)', re.IGNORECASE)
+        # Fixed layer-name sets, built once rather than on every analyze_layers call
+        self.COLOR_LAYERS = frozenset(str(i) for i in range(1, 9))
+        self.AREA_LAYERS = frozenset({'2D', '면적', 'AREA'})
+        # Keyword lists as single alternations so layer matching runs inside pandas' str engine
+        self.SITE_PATTERN = re.compile('|'.join(map(re.escape, self.SITE_KWS)))
+        self.FOOTPRINT_PATTERN = re.compile('|'.join(map(re.escape, self.FOOTPRINT_KWS)))
+
+    def _get_vertices(self, e):
+        """LWPOLYLINE outline as an (N, 2) array; other entity types carry no area here"""
+        return np.asarray(e.get_points('xy'), dtype=np.float64).reshape(-1, 2)
 
     def analyze_layers(self):
-        geometry_data = []
-        for e in self.msp:
-            area = self._get_area(e)
-            if area > 0.05:
-                geometry_data.append({'layer': e.dxf.layer.upper(), 'area': area})
-
-        df = pd.DataFrame(geometry_data)
+        ring_layers, rings = [], []
+        for e in self.msp.query('LWPOLYLINE'):
+            verts = self._get_vertices(e)
+            if len(verts):
+                ring_layers.append(upper_layer(e.dxf.layer))
+                rings.append(verts)
+
+        areas = measure_rings(rings) / self.scale
+        keep = areas > 0.05
+        df = pd.DataFrame({'layer': np.asarray(ring_layers, dtype=object)[keep], 'area': areas[keep]})
         if df.empty: return {}, {}, set()
 
+        # Largest area per layer once; the role checks below then scan layers, not entities
+        layer_max = df.groupby('layer', sort=False)['area'].max()
+        layers = layer_max.index.to_series()
+
         # Identify Site Layer
-        site_mask = df['layer'].apply(lambda x: any(k in x for k in self.SITE_KWS))
-        if any(site_mask):
-            site_layer = df[site_mask].loc[df[site_mask]['area'].idxmax(), 'layer']
+        site_mask = layers.str.contains(self.SITE_PATTERN)
+        if site_mask.any():
+            site_layer = layer_max[site_mask].idxmax()
         else:
-            site_layer = df.loc[df['area'].idxmax(), 'layer']
+            site_layer = layer_max.idxmax()
 
         # Identify Footprint Layers
-        footprint_mask = df['layer'].apply(lambda x: any(k in x for k in self.FOOTPRINT_KWS))
-        footprint_layers = set(df[footprint_mask]['layer'].unique()) if any(footprint_mask) else set()
+        footprint_layers = set(layers[layers.str.contains(self.FOOTPRINT_PATTERN)])
 
         # Identify Floor Layers
-        floor_layers = set()
-        for layer in df['layer'].unique():
-            match = self.FLOOR_PATTERN.search(layer)
-            is_color_layer = layer in [str(i) for i in range(1, 9)]
-            if (match and not is_color_layer) or layer in ['2D', '면적', 'AREA'] or ("HH" in layer):
-                floor_layers.add(layer)
+        is_color_layer = layers.isin(self.COLOR_LAYERS)
+        floor_mask = ((layers.str.extract(self.FLOOR_PATTERN)[0].notna() & ~is_color_layer)
+                      | layers.isin(self.AREA_LAYERS)
+                      | layers.str.contains('HH', regex=False))
+        floor_layers = set(layers[floor_mask])
 
         return {
             "site": site_layer,
@@ -82,7 +104,7 @@ class ComplianceAuditor:
 
 def process_dxf(file_path, active_layers=None):
     try:
-        doc = ezdxf.readfile(file_path)
+        doc = load_dxf(file_path)
     except Exception as e:
         return None, 0, str(e)
 
@@ -91,74 +113,70 @@ def process_dxf(file_path, active_layers=None):
     scale = UNIT_TO_METERS.get(units_code, 0.0254)
     if units_code == 2: scale = 0.0254
 
-    lines = []
-    # Store layer info with lines to preserve identity
-    line_layers = [] 
+    segments = []
 
     for entity in msp.query('LINE LWPOLYLINE'):
+        layer = entity.dxf.layer
         # Filter by active layers if specified
-        if active_layers is not None and entity.dxf.layer not in active_layers:
+        if active_layers is not None and layer not in active_layers:
             continue
             
-        l_geom = None
         if entity.dxftype() == 'LINE':
-            l_geom = LineString([(entity.dxf.start.x, entity.dxf.start.y), (entity.dxf.end.x, entity.dxf.end.y)])
-        elif entity.dxftype() == 'LWPOLYLINE':
-            points = list(entity.get_points(format='xy'))
-            for i in range(len(points) - 1):
-                # We treat polylines as individual segments for polygonization
-                lines.append(LineString([points[i], points[i+1]]))
-                line_layers.append(entity.dxf.layer) # Track layer
+            points = np.array([[entity.dxf.start.x, entity.dxf.start.y], [entity.dxf.end.x, entity.dxf.end.y]])
+        else:
+            points = np.asarray(entity.get_points(format='xy'), dtype=np.float64).reshape(-1, 2)
             if entity.is_closed:
-                lines.append(LineString([points[-1], points[0]]))
-                line_layers.append(entity.dxf.layer)
-            continue # Skip append below since handled in loop
-
-        if l_geom:
-            lines.append(l_geom)
-            line_layers.append(entity.dxf.layer)
+                points = np.vstack([points, points[:1]])
+        # We treat polylines as individual segments for polygonization
+        if len(points) > 1:
+            segments.append(np.stack([points[:-1], points[1:]], axis=1))
 
     # Note: Polygonization merges lines, so we lose 1-to-1 layer mapping for the final polygon.
     # However, we can guess the layer of a polygon by checking which lines form its boundary.
     # For visualization, we will prioritize the layer of the longest segment.
     
-    rounded = []
-    rounded_layers = []
-    for i, line in enumerate(lines):
-        p1 = (round(line.coords[0][0], 3), round(line.coords[0][1], 3))
-        p2 = (round(line.coords[-1][0], 3), round(line.coords[-1][1], 3))
-        if p1 != p2: 
-            rounded.append(LineString([p1, p2]))
-            rounded_layers.append(line_layers[i])
-
-    G = nx.Graph()
-    for line in rounded: G.add_edge(line.coords[0], line.coords[-1])
-    dead_ends = [Point(n) for n, d in G.degree() if d == 1]
+    # Snap all endpoints at once and drop segments that collapse to a point
+    coords = np.round(np.concatenate(segments), 3) if segments else np.empty((0, 2, 2))
+    keep = np.any(coords[:, 0] != coords[:, 1], axis=1)
+    coords = coords[keep]
+    # Build every segment in one GEOS call instead of a LineString per segment
+    rounded = shapely.linestrings(coords)
+
+    # Dead ends are endpoints of exactly one distinct segment. Orient each segment so its
+    # lexicographically smaller end comes first, so duplicates collapse in np.unique
+    a, b = coords[:, 0], coords[:, 1]
+    flip = (a[:, 0] > b[:, 0]) | ((a[:, 0] == b[:, 0]) & (a[:, 1] > b[:, 1]))
+    edges = np.where(flip[:, None, None], coords[:, ::-1], coords)
+    edges = np.unique(edges.reshape(-1, 4), axis=0).reshape(-1, 2, 2)
+    nodes, degree = np.unique(edges.reshape(-1, 2), axis=0, return_counts=True)
+    dead_ends = shapely.points(nodes[degree == 1])
     
-    extensions = []
-    extension_layers = []
-    if dead_ends and rounded:
-        candidates_geom = MultiLineString(rounded)
-        for p in dead_ends:
-            nearest = nearest_points(p, candidates_geom)[1]
-            if p.distance(nearest) < (EXTENSION_TOLERANCE / scale):
-                extensions.append(LineString([p, nearest]))
-                # Assign a default or inherited layer for extensions
-                extension_layers.append("EXTENSION") 
-
-    all_lines = rounded + extensions
+    extensions = np.empty(0, dtype=object)
+    if len(dead_ends) and len(rounded):
+        # Spatial index over the segments, queried for every dead end in one call
+        tree = STRtree(rounded)
+        nearest = rounded[tree.nearest(dead_ends)]
+        # shortest_line runs from each dead end to its nearest point on the matched segment
+        bridges = shapely.shortest_line(dead_ends, nearest)
+        extensions = bridges[shapely.distance(dead_ends, nearest) < (EXTENSION_TOLERANCE / scale)]
+
+    # Geometry arrays end to end: no per-segment Python objects on the way into GEOS
+    all_lines = np.concatenate([rounded, extensions])
     # (Skipping robust layer tracking through union for brevity, relying on spatial match later if needed)
     noded = unary_union(all_lines)
     final_lines = list(noded.geoms) if not isinstance(noded, LineString) else [noded]
     
-    polys = list(polygonize(final_lines))
-    valid_polys = [p for p in polys if p.area * (scale**2) > 0.001]
+    polys = np.array(list(polygonize(final_lines)), dtype=object)
+    # One batched GEOS call for every area, reused for both the filter and the sort
+    areas = shapely.area(polys)
+    keep = areas * (scale**2) > 0.001
+    valid_polys, areas = polys[keep], areas[keep]
     
     # Pack polygons with their probable source layer (naive approach: check overlap with original lines)
     # Since checking overlap is expensive, we'll return raw polys and let the visualizer apply color 
     # based on the *auditor's* identified layers, assuming the user selected those layers.
     
-    valid_polys.sort(key=lambda p: p.area, reverse=True)
+    valid_polys = valid_polys[np.argsort(-areas, kind='stable')].tolist()
     
     return valid_polys, scale, None
 
@@ -213,6 +231,7 @@ class DXFAnalyzerApp:
         self.root.geometry("1280x850")
 
         self.polys = []
+        self.areas = np.empty(0) # Per-polygon area in m², parallel to self.polys
         self.scale = 1.0
         self.current_file = None
         self.active_layers = None
@@ -318,6 +337,7 @@ class DXFAnalyzerApp:
             
         self.polys = polys
         self.scale = scale
+        self.areas = shapely.area(np.asarray(polys, dtype=object)) * (scale**2)
         self.status_var.set(f"Loaded {len(polys)} regions. Site Layer: {self.detected_roles.get('site', 'None')}")
         self.draw_map()
 
@@ -328,7 +348,7 @@ class DXFAnalyzerApp:
         self.ax.axis('off')
 
         if not self.polys:
-            self.canvas.draw()
+            self.canvas.draw_idle()
             return
 
         # We don't have per-polygon layer info in valid_polys list directly because of merging.
@@ -342,34 +362,29 @@ class DXFAnalyzerApp:
         # For this "Aside Script", let's do a trick: 
         # We know the SITE is usually the largest polygon.
         
-        site_poly = None
-        if self.polys:
-            site_poly = self.polys[0] # Largest is usually site
-
-        for i, p in enumerate(self.polys):
-            # Default Color
-            face_c = '#333333' 
-            alpha = 0.3
-            edge_c = '#555555'
-            
-            # Heuristic Coloring based on Audit Results
-            # Since we can't link back to exact layer easily without heavy refactor,
-            # we highlight the largest as SITE, and others based on typical size.
-            
-            if i == 0: # Largest -> Likely Site
-                face_c = '#00CED1' # Dark Turquoise (Cyan-ish)
-                alpha = 0.3
-                edge_c = 'white'
-            elif p.area > (site_poly.area * 0.05): # Significant size -> Likely Building/Floor
-                face_c = '#FF8C00' # Dark Orange
-                alpha = 0.6
-                edge_c = 'white'
-            
-            # Draw
-            x, y = p.exterior.xy
-            self.ax.fill(x, y, color=face_c, alpha=alpha, ec=edge_c, lw=1)
-
-        self.canvas.draw()
+        # Heuristic Coloring based on Audit Results
+        # Since we can't link back to exact layer easily without heavy refactor,
+        # we highlight the largest as SITE, and others based on typical size.
+        # Role index per polygon: 0 = default, 1 = site, 2 = building/floor
+        roles = np.zeros(len(self.polys), dtype=np.intp)
+        roles[self.areas > (self.areas[0] * 0.05)] = 2 # Significant size -> Likely Building/Floor
+        roles[0] = 1 # Largest -> Likely Site
+
+        # Default, Dark Turquoise (Cyan-ish), Dark Orange
+        alphas = [0.3, 0.3, 0.6]
+        face_colors = to_rgba_array(['#333333', '#00CED1', '#FF8C00'], alpha=alphas)
+        edge_colors = to_rgba_array(['#555555', 'white', 'white'], alpha=alphas)
+
+        # Draw every region as one collection instead of one fill() artist per polygon
+        # All exterior vertices in one GEOS call, split back into one array per polygon
+        exteriors = shapely.get_exterior_ring(np.asarray(self.polys, dtype=object))
+        coords, owner = shapely.get_coordinates(exteriors, return_index=True)
+        rings = np.split(coords, np.flatnonzero(np.diff(owner)) + 1)
+        self.ax.add_collection(PolyCollection(rings, facecolors=face_colors[roles], edgecolors=edge_colors[roles], linewidths=1))
+        self.ax.autoscale_view()
+
+        # Let Tk coalesce the repaint instead of rasterizing synchronously on every reload
+        self.canvas.draw_idle()
 
 if __name__ == "__main__":
     root = tk.Tk()
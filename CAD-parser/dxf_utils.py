@@ -1,11 +1,46 @@
+import functools
 import ezdxf
-from shapely.geometry import LineString, Point, MultiLineString, Polygon
-from shapely.ops import polygonize, unary_union, nearest_points
-import networkx as nx
+import shapely
+from shapely.geometry import LineString, Polygon
+from shapely.ops import polygonize, unary_union
+from shapely.strtree import STRtree
+import numpy as np
 
 UNIT_TO_METERS = {0: 0.0254, 1: 0.0254, 2: 0.0254, 4: 0.001, 5: 0.01, 6: 1.0}
 EXTENSION_TOLERANCE = 1.5
 
+def polygon_area(points):
+    """Absolute shoelace area of a sequence of (x, y) points; the closing edge is implied"""
+    if len(points) < 3:
+        return 0.0
+    total = 0.0
+    px, py = points[-1]
+    for x, y in points:
+        total += px * y - x * py
+        px, py = x, y
+    return 0.5 * abs(total)
+
+def measure_rings(rings):
+    """Areas of a list of non-empty (N, 2) outlines, in one vectorized pass"""
+    if not rings:
+        return np.empty(0)
+    coords = np.concatenate(rings)
+    counts = np.array([len(r) for r in rings])
+    offsets = np.concatenate([[0], np.cumsum(counts[:-1])])
+    x, y = coords[:, 0], coords[:, 1]
+    cross = np.empty(len(coords))
+    cross[:-1] = x[:-1] * y[1:] - x[1:] * y[:-1]
+    # The last vertex of each ring closes back to its own first vertex,
+    # overwriting the bogus edge that would run into the next ring
+    ends = offsets + counts - 1
+    cross[ends] = x[ends] * y[offsets] - x[offsets] * y[ends]
+    return 0.5 * np.abs(np.add.reduceat(cross, offsets))
+
+@functools.lru_cache(maxsize=None)
+def upper_layer(name):
+    """Upper-cased layer name, cached: drawings reuse a few dozen names across thousands of entities"""
+    return name.upper()
+
 def get_dxf_layers(file_path):
     try:
         doc = ezdxf.readfile(file_path)
@@ -28,56 +63,66 @@ def process_dxf_geometry(file_path, active_layers=None):
     scale = UNIT_TO_METERS.get(units_code, 0.0254)
     if units_code == 2: scale = 0.0254
 
-    lines = []
+    segments = []
     for entity in msp.query('LINE LWPOLYLINE'):
         if active_layers is not None and len(active_layers) > 0:
              if entity.dxf.layer not in active_layers:
                 continue
             
         if entity.dxftype() == 'LINE':
-            lines.append(LineString([(entity.dxf.start.x, entity.dxf.start.y), (entity.dxf.end.x, entity.dxf.end.y)]))
-        elif entity.dxftype() == 'LWPOLYLINE':
-            points = list(entity.get_points(format='xy'))
-            if len(points) > 1:
-                for i in range(len(points) - 1):
-                    lines.append(LineString([points[i], points[i+1]]))
-                if entity.is_closed:
-                    lines.append(LineString([points[-1], points[0]]))
+            points = np.array([[entity.dxf.start.x, entity.dxf.start.y], [entity.dxf.end.x, entity.dxf.end.y]])
+        else:
+            points = np.asarray(entity.get_points(format='xy'), dtype=np.float64).reshape(-1, 2)
+            if len(points) > 1 and entity.is_closed:
+                points = np.vstack([points, points[:1]])
+        if len(points) > 1:
+            segments.append(np.stack([points[:-1], points[1:]], axis=1))
 
-    rounded = []
-    for line in lines:
-        p1 = (round(line.coords[0][0], 3), round(line.coords[0][1], 3))
-        p2 = (round(line.coords[-1][0], 3), round(line.coords[-1][1], 3))
-        if p1 != p2: rounded.append(LineString([p1, p2]))
+    # Snap all endpoints at once and drop segments that collapse to a point
+    coords = np.round(np.concatenate(segments), 3) if segments else np.empty((0, 2, 2))
+    keep = np.any(coords[:, 0] != coords[:, 1], axis=1)
+    coords = coords[keep]
+    # Build every segment in one GEOS call instead of a LineString per segment
+    rounded = shapely.linestrings(coords)
 
-    G = nx.Graph()
-    for line in rounded: G.add_edge(line.coords[0], line.coords[-1])
-    dead_ends = [Point(n) for n, d in G.degree() if d == 1]
+    # Dead ends are endpoints of exactly one distinct segment. Orient each segment so its
+    # lexicographically smaller end comes first, so duplicates collapse in np.unique
+    a, b = coords[:, 0], coords[:, 1]
+    flip = (a[:, 0] > b[:, 0]) | ((a[:, 0] == b[:, 0]) & (a[:, 1] > b[:, 1]))
+    edges = np.where(flip[:, None, None], coords[:, ::-1], coords)
+    edges = np.unique(edges.reshape(-1, 4), axis=0).reshape(-1, 2, 2)
+    nodes, degree = np.unique(edges.reshape(-1, 2), axis=0, return_counts=True)
+    dead_ends = shapely.points(nodes[degree == 1])
     
-    extensions = []
-    if dead_ends and rounded:
-        candidates_geom = MultiLineString(rounded)
-        for p in dead_ends:
-            nearest = nearest_points(p, candidates_geom)[1]
-            if p.distance(nearest) < (EXTENSION_TOLERANCE / scale):
-                extensions.append(LineString([p, nearest]))
+    extensions = np.empty(0, dtype=object)
+    if len(dead_ends) and len(rounded):
+        # Spatial index over the segments, queried for every dead end in one call
+        tree = STRtree(rounded)
+        nearest = rounded[tree.nearest(dead_ends)]
+        # shortest_line runs from each dead end to its nearest point on the matched segment
+        bridges = shapely.shortest_line(dead_ends, nearest)
+        extensions = bridges[shapely.distance(dead_ends, nearest) < (EXTENSION_TOLERANCE / scale)]
 
-    all_lines = rounded + extensions
+    # Geometry arrays end to end: no per-segment Python objects on the way into GEOS
+    all_lines = np.concatenate([rounded, extensions])
     noded = unary_union(all_lines)
     final_lines = list(noded.geoms) if not isinstance(noded, LineString) else [noded]
     
-    polys = list(polygonize(final_lines))
-    valid_polys = [p for p in polys if p.area * (scale**2) > 0.001]
-    valid_polys.sort(key=lambda p: p.area, reverse=True)
+    polys = np.array(list(polygonize(final_lines)), dtype=object)
+    # One batched GEOS call for every area, reused for the filter, the sort and the output
+    areas = shapely.area(polys)
+    keep = areas * (scale**2) > 0.001
+    order = np.argsort(-areas[keep], kind='stable')
+    valid_polys, valid_areas = polys[keep][order], areas[keep][order].tolist()
     
     output_polygons = []
-    for i, p in enumerate(valid_polys):
+    for i, (p, area) in enumerate(zip(valid_polys, valid_areas)):
         exterior_coords = list(p.exterior.coords)
         output_polygons.append({
             "id": i,
             "points": exterior_coords,
-            "area_raw": p.area,
-            "area_m2": p.area * (scale**2)
+            "area_raw": area,
+            "area_m2": area * (scale**2)
         })
 
     # Calculate bounding box for ViewBox
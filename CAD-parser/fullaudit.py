@@ -1,7 +1,8 @@
 import ezdxf
 import re
-import pandas as pd
-from ezdxf.math import Vec2
+import numpy as np
+from collections import defaultdict
+from dxf_utils import measure_rings, upper_layer
 
 class FinalComplianceAuditor:
     def __init__(self, file_path):
@@ -19,69 +20,77 @@ class FinalComplianceAuditor:
         self.SITE_KWS = ['지적', 'SITE', '대지', 'LND', 'BOUNDARY']
         self.FOOTPRINT_KWS = ['HH', 'FOOTPRINT', '건축면적']
         # Expanded Floor detection (Catching '1', '2', '층', 'FLR', 'FLOOR')
-        self.FLOOR_PATTERN = self.FLOOR_PATTERN = re.compile(r'(B?\d+)(F|층|FLR|FLOOR|ND|ST|RD|TH)', re.IGNORECASE)
+        # Possessive quantifiers: a digit run is never given back, so long numeric names cannot backtrack
+        self.FLOOR_PATTERN = re.compile(r'(B?\d++)(F|층|FLR|FLOOR|ND|ST|RD|TH)', re.IGNORECASE)
+        # Hashed sets for the per-layer membership checks in run_audit
+        self.COLOR_LAYERS = frozenset(str(i) for i in range(1, 9))
+        self.AREA_LAYERS = frozenset({'2D', '면적', 'AREA'})
+        # Keyword lists as single alternations so each layer name is matched in one search
+        self.SITE_PATTERN = re.compile('|'.join(map(re.escape, self.SITE_KWS)))
+        self.FOOTPRINT_PATTERN = re.compile('|'.join(map(re.escape, self.FOOTPRINT_KWS)))
+        
+        # Material keywords as one alternation, and the MTEXT formatting codes stripped before matching
+        self.MATERIAL_KWS = ["마감", "유리", "콘크리트", "THK", "단열재", "방수"]
+        self.MATERIAL_PATTERN = re.compile('|'.join(map(re.escape, self.MATERIAL_KWS)))
+        self.MTEXT_CODE_PATTERN = re.compile(r'\\[A-Za-z][^;]*;')
+        # Anything plain_text() would rewrite: inline codes, grouping, caret and %% escapes, line breaks
+        self.TEXT_MARKUP_PATTERN = re.compile(r'[\\{}^%\r\n]')
         
         # Elevation pattern to detect EL values (e.g., "EL+12500", "EL 12.5", "EL+12,500", "EL=12500")
-        self.EL_PATTERN = re.compile(r'EL\s*[+=]?\s*([\d,]+(?:\.\d+)?)', re.IGNORECASE)
+        self.EL_PATTERN = re.compile(r'EL\s*+[+=]?\s*+([\d,]++(?:\.\d+)?)', re.IGNORECASE)
 
-    def _get_area(self, e):
-        try:
-            if e.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                if hasattr(e, 'area'): return abs(e.area) / self.scale
-                return abs(ezdxf.math.area([Vec2(v[:2]) for v in e.get_points()])) / self.scale
-            return 0.0
-        except: return 0.0
+    def _get_vertices(self, e):
+        """LWPOLYLINE outline as an (N, 2) array; other entity types carry no area here"""
+        return np.asarray(e.get_points('xy'), dtype=np.float64).reshape(-1, 2)
     
-    def _extract_elevation(self, text):
-        """Extract elevation value from text containing EL notation"""
-        match = self.EL_PATTERN.search(text)
-        if match:
-            value_str = match.group(1).replace(',', '')  # Remove commas
+    def _extract_elevations(self, texts):
+        """Extract elevation values (first EL notation per text) from all texts in one regex sweep"""
+        # NUL cannot be part of an EL match, so no match spans two texts and the
+        # first match inside each text is the one a per-text search would find
+        corpus = '\0'.join(texts)
+        starts = np.cumsum([0] + [len(t) + 1 for t in texts[:-1]])
+        matches = list(self.EL_PATTERN.finditer(corpus))
+        owners = np.searchsorted(starts, [m.start() for m in matches], side='right') - 1
+        _, first = np.unique(owners, return_index=True)
+        
+        values = []
+        for i in first.tolist():
             try:
-                value = float(value_str)
-                # If value > 100, assume it's in mm and convert to m
-                if value > 100:
-                    return value * 0.001
-                return value
+                values.append(float(matches[i].group(1).replace(',', '')))  # Remove commas
             except ValueError:
-                return None
-        return None
+                pass
+        values = np.asarray(values, dtype=np.float64)
+        # If value > 100, assume it's in mm and convert to m
+        return np.where(values > 100, values * 0.001, values).tolist()
 
     def run_audit(self):
-        geometry_data = []
         material_data = [] 
-        elevation_values = []  # Store all found EL values
-        mat_kws = ["마감", "유리", "콘크리트", "THK", "단열재", "방수"]
+        texts = []  # Cleaned TEXT/MTEXT bodies, scanned for EL values after the loop
 
-        for e in self.msp:
-            # 1. Geometry Extraction
-            area = self._get_area(e)
-            if area > 0.05:
-                # We calculate a simple center point for spatial context instead of bounding_box
-                try:
-                    if e.dxftype() == 'LWPOLYLINE':
-                        verts = e.get_points()
-                        center_x = sum(v[0] for v in verts) / len(verts)
-                        center_y = sum(v[1] for v in verts) / len(verts)
-                        pos = (center_x, center_y)
-                    else:
-                        pos = (0, 0)
-                except:
-                    pos = (0, 0)
+        ring_layers, rings = [], []
 
-                geometry_data.append({
-                    'layer': e.dxf.layer.upper(), 
-                    'area': area,
-                    'pos': pos # Fixed the AttributeError here
-                })
+        for e in self.msp:
+            dxftype = e.dxftype()
+            
+            # 1. Geometry Extraction: collect outlines here, measure them all after the loop
+            if dxftype == 'LWPOLYLINE':
+                verts = self._get_vertices(e)
+                if len(verts):
+                    ring_layers.append(upper_layer(e.dxf.layer))
+                    rings.append(verts)
             
             # 2. Material & Elevation Extraction from TEXT entities
-            if e.dxftype() in ['TEXT', 'MTEXT']:
-                txt = e.plain_text()
-                txt = re.sub(r'\\[A-Za-z][^;]*;', '', txt).strip()
+            elif dxftype == 'TEXT' or dxftype == 'MTEXT':
+                raw = e.text if dxftype == 'MTEXT' else e.dxf.text
+                if self.TEXT_MARKUP_PATTERN.search(raw):
+                    txt = e.plain_text()
+                    txt = self.MTEXT_CODE_PATTERN.sub('', txt).strip()
+                else:
+                    # Most annotations carry no markup, so plain_text() would hand back the raw string
+                    txt = raw.strip()
                 
                 # Check for material keywords
-                if any(k in txt for k in mat_kws):
+                if self.MATERIAL_PATTERN.search(txt):
                     # Get insertion point safely
                     try:
                         ins_pos = e.dxf.insert
@@ -90,48 +99,57 @@ class FinalComplianceAuditor:
                         
                     material_data.append({
                         'text': txt,
-                        'layer': e.dxf.layer.upper(),
+                        'layer': upper_layer(e.dxf.layer),
                         'pos': ins_pos
                     })
                 
-                # Check for elevation values (EL notation)
-                el_value = self._extract_elevation(txt)
-                if el_value is not None:
-                    elevation_values.append(el_value)
+                texts.append(txt)
 
-        df = pd.DataFrame(geometry_data)
-        if df.empty:
+        areas = measure_rings(rings) / self.scale
+        
+        # Check for elevation values (EL notation)
+        elevation_values = self._extract_elevations(texts)
+        
+        # Per-layer totals and maxima accumulated directly; dict order is first appearance
+        layer_sum = defaultdict(float)
+        layer_max = defaultdict(float)
+        for layer, area in zip(ring_layers, areas.tolist()):
+            if area > 0.05:
+                layer_sum[layer] += area
+                layer_max[layer] = max(layer_max[layer], area)
+        
+        if not layer_sum:
             return {"error": "No geometry found"}
 
         # --- LOGIC: SITE & FOOTPRINT ---
-        site_mask = df['layer'].apply(lambda x: any(k in x for k in self.SITE_KWS))
-        site_area = df[site_mask]['area'].max() if any(site_mask) else df['area'].max()
+        site_areas = [area for layer, area in layer_max.items() if self.SITE_PATTERN.search(layer)]
+        site_area = max(site_areas) if site_areas else max(layer_max.values())
 
-        footprint_mask = df['layer'].apply(lambda x: any(k in x for k in self.FOOTPRINT_KWS))
-        footprint_area = df[footprint_mask]['area'].sum() if any(footprint_mask) else 0
+        footprint_area = sum(total for layer, total in layer_sum.items() if self.FOOTPRINT_PATTERN.search(layer))
 
         # --- LOGIC: FLOOR DETECTION ---
         floor_totals = {}
-        for layer in df['layer'].unique():
+        for layer, total in layer_sum.items():
             # 1. Match standard tags like 2F, 2층, etc.
             match = self.FLOOR_PATTERN.search(layer)
             
             # CRITICAL FIX: Only treat numeric layers as floors if they are NOT 1-8 colors
-            is_color_layer = layer in [str(i) for i in range(1, 9)]
+            is_color_layer = layer in self.COLOR_LAYERS
             
             if match and not is_color_layer:
                 floor_tag = f"{match.group(1)}F"
-                floor_totals[floor_tag] = floor_totals.get(floor_tag, 0) + df[df['layer'] == layer]['area'].sum()
             
             # 2. Check specific architectural area layers
-            elif layer in ['2D', '면적', 'AREA']:
+            elif layer in self.AREA_LAYERS:
                 # Logic: If it's a 2F house, 2D layer is likely the 2nd floor
-                tag = "2F" if "2" in layer else "1F"
-                floor_totals[tag] = floor_totals.get(tag, 0) + df[df['layer'] == layer]['area'].sum()
+                floor_tag = "2F" if "2" in layer else "1F"
                 
             # 3. Use HH for the Primary Footprint (1F)
             elif "HH" in layer:
-                floor_totals["1F"] = floor_totals.get("1F", 0) + df[df['layer'] == layer]['area'].sum()
+                floor_tag = "1F"
+            else:
+                continue
+            floor_totals[floor_tag] = floor_totals.get(floor_tag, 0) + total
         # Final floor area calculation
         total_floor_area = sum(floor_totals.values())
         
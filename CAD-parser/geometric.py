@@ -2,9 +2,15 @@ import ezdxf
 import re
 import pandas as pd
 import os
-from ezdxf.math import Vec2
+import math
+from dxf_utils import polygon_area, upper_layer
 
 class CivilComplianceAuditor:
+    # MTEXT formatting codes like \A1; \C1; \H0.5x;
+    MTEXT_CODE_PATTERN = re.compile(r'\\[A-Za-z][^;]*;')
+    # Grouping braces, dropped in one translate() pass
+    BRACE_TABLE = str.maketrans('', '', '{}')
+
     def __init__(self, file_path):
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"DXF file not found: {file_path}")
@@ -26,6 +32,10 @@ class CivilComplianceAuditor:
             # 2. Keyword Lists (Substring matching handles '지적선', '대지경계선', etc.)
             self.SITE_KEYWORDS = ['SITE', '대지', '지적', 'LND', 'BOUNDARY']
             self.BLDG_KEYWORDS = ['HH', 'WALL', '벽체', 'FOOTPRINT', 'FORM', '건축']
+            self.SITE_PATTERN = re.compile('|'.join(map(re.escape, self.SITE_KEYWORDS)))
+            self.BLDG_PATTERN = re.compile('|'.join(map(re.escape, self.BLDG_KEYWORDS)))
+            self.MATERIAL_KEYWORDS = ["마감", "유리", "콘크리트", "THK", "단열재", "방수", "내화"]
+            self.MATERIAL_PATTERN = re.compile('|'.join(map(re.escape, self.MATERIAL_KEYWORDS)))
             
         except Exception as e:
             raise RuntimeError(f"Failed to load DXF: {e}")
@@ -33,57 +43,50 @@ class CivilComplianceAuditor:
     def _clean_mtext(self, text):
         """Removes AutoCAD formatting codes and normalizes Korean text."""
         # Remove codes like \A1; \P \C1; \H0.5x;
-        text = re.sub(r'\\[A-Za-z][^;]*;', '', text) 
-        text = re.sub(r'\\P', ' ', text)
-        text = re.sub(r'[{}]', '', text)
+        text = self.MTEXT_CODE_PATTERN.sub('', text)
+        text = text.replace('\\P', ' ').translate(self.BRACE_TABLE)
         return ' '.join(text.split()).strip()
 
     def _get_entity_area(self, entity):
         """Extracts precise area from polylines or circles."""
-        try:
-            if entity.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                # Use native area if available, else calculate from vertices
-                if hasattr(entity, 'area'):
-                    return abs(entity.area) / self.scale_factor
-                vertices = [Vec2(v[:2]) for v in entity.get_points()]
-                if len(vertices) >= 3:
-                    return abs(ezdxf.math.area(vertices)) / self.scale_factor
-            elif entity.dxftype() == 'CIRCLE':
-                return (3.14159 * (entity.dxf.radius ** 2)) / self.scale_factor
-            return 0.0
-        except:
-            return 0.0
+        dxftype = entity.dxftype()
+        # POLYLINE has no get_points(), so it always fell through to 0.0 here; only LWPOLYLINE is measured
+        if dxftype == 'LWPOLYLINE':
+            return polygon_area(entity.get_points('xy')) / self.scale_factor
+        elif dxftype == 'CIRCLE':
+            radius = entity.dxf.radius
+            return (math.pi * radius * radius) / self.scale_factor
+        return 0.0
 
     def run_audit(self):
-        area_records = []
+        # Column lists rather than per-row dicts, so the DataFrame is built column-wise
+        record_layers, record_areas = [], []
         materials = set()
-        material_keywords = ["마감", "유리", "콘크리트", "THK", "단열재", "방수", "내화"]
 
-        # Iterate through all objects in the drawing
-        for entity in self.msp:
-            # A. Process Geometry
+        # A. Process Geometry (only entity types that can carry an area)
+        for entity in self.msp.query('LWPOLYLINE CIRCLE'):
             area = self._get_entity_area(entity)
             if area > 0.05: # Ignore tiny artifacts
-                area_records.append({
-                    'layer': entity.dxf.layer.upper(),
-                    'area': area
-                })
-            
-            # B. Process Text for Materials (Article 11)
-            if entity.dxftype() in ['TEXT', 'MTEXT']:
-                raw_text = entity.plain_text() if hasattr(entity, 'plain_text') else ""
-                clean_text = self._clean_mtext(raw_text)
-                if any(kw in clean_text for kw in material_keywords):
-                    materials.add(clean_text)
+                record_layers.append(upper_layer(entity.dxf.layer))
+                record_areas.append(area)
+
+        # B. Process Text for Materials (Article 11)
+        for entity in self.msp.query('TEXT MTEXT'):
+            raw_text = entity.plain_text() if hasattr(entity, 'plain_text') else ""
+            clean_text = self._clean_mtext(raw_text)
+            if self.MATERIAL_PATTERN.search(clean_text):
+                materials.add(clean_text)
 
-        if not area_records:
+        if not record_areas:
             raise ValueError("No valid geometric shapes found in the DXF.")
 
-        df = pd.DataFrame(area_records)
+        df = pd.DataFrame({'layer': record_layers, 'area': record_areas})
+        # Few distinct layers: the masks and comparisons below then work per category, not per row
+        df['layer'] = df['layer'].astype('category')
 
         # --- LOGIC: SITE DETECTION ---
         # Strategy: Match keywords first. If failed or too small, use largest overall shape.
-        site_mask = df['layer'].apply(lambda x: any(kw in x for kw in self.SITE_KEYWORDS))
+        site_mask = df['layer'].str.contains(self.SITE_PATTERN)
         site_df = df[site_mask]
         
         if not site_df.empty and site_df['area'].max() > 20: 
@@ -97,7 +100,7 @@ class CivilComplianceAuditor:
 
         # --- LOGIC: BUILDING DETECTION ---
         # Strategy: Sum all areas on layers containing 'HH' or 'WALL'
-        bldg_mask = df['layer'].apply(lambda x: any(kw in x for kw in self.BLDG_KEYWORDS))
+        bldg_mask = df['layer'].str.contains(self.BLDG_PATTERN)
         bldg_df = df[bldg_mask]
         
         # Filter out the site layer itself to avoid double-counting
@@ -1,82 +1,111 @@
-import ezdxf
 import re
-import pandas as pd
-from ezdxf.math import Vec2
+import ezdxf
+import numpy as np
+from ezdxf.addons import iterdxf
+from ezdxf.filemanagement import dxf_file_info
+from ezdxf.lldxf.validator import is_binary_dxf_file
+from dxf_utils import polygon_area, upper_layer
 
 class HybridPermitAuditor:
+    # MTEXT formatting codes like \A1; \C1; \H0.5x;
+    MTEXT_CODE_PATTERN = re.compile(r'\\[A-Za-z][^;]*;')
+
     def __init__(self, file_path):
         try:
-            self.doc = ezdxf.readfile(file_path)
-            self.msp = self.doc.modelspace()
+            self.file_path = file_path
+            if is_binary_dxf_file(file_path):
+                # iterdxf only reads ASCII DXF, so binary files are loaded as a whole
+                self.doc = ezdxf.readfile(file_path)
+                units = self.doc.header.get('$INSUNITS', 4)
+            else:
+                # Only the header is scanned here; audit() streams the entities it
+                # needs instead of loading the whole document into memory
+                self.doc = None
+                units = dxf_file_info(file_path).insert_units
             
             # [Claude's Fix] Unit Validation
-            self.units = self.doc.header.get('$INSUNITS', 4) # 4 = mm
+            self.units = units # 4 = mm
             self.scale_factor = 1_000_000 if self.units in [0, 4] else 1.0
             
             # [Claude's Fix] Legal Layer Keywords
-            self.SITE_LAYERS = ['지적선', 'SITE', '대지', '지적', 'LND']  # 지적선 = cadastral line (highest priority)
-            self.BLDG_LAYERS = ['HH', 'A-WALL', '건축벽체', 'ARCH-WALL', 'FOOTPRINT', 'FORM']
+            # Only used for isin() membership, so hashed sets suffice (지적선 = cadastral line)
+            self.SITE_LAYERS = frozenset({'지적선', 'SITE', '대지', '지적', 'LND'})
+            self.BLDG_LAYERS = frozenset({'HH', 'A-WALL', '건축벽체', 'ARCH-WALL', 'FOOTPRINT', 'FORM'})
+
+            # Material keywords as one alternation, so each text is scanned once
+            self.MATERIAL_KEYWORDS = ["마감", "유리", "콘크리트", "THK", "단열재", "방수", "내화"]
+            self.MATERIAL_PATTERN = re.compile('|'.join(map(re.escape, self.MATERIAL_KEYWORDS)))
             
         except Exception as e:
             raise RuntimeError(f"Failed to load DXF: {e}")
 
     def clean_text(self, text):
         # [Claude's Fix] Improved Regex for Korean characters and AutoCAD codes
-        text = re.sub(r'\\[A-Za-z][^;]*;', '', text) 
-        text = re.sub(r'\\P', ' ', text)
+        text = self.MTEXT_CODE_PATTERN.sub('', text)
+        text = text.replace('\\P', ' ')
         return ' '.join(text.split()).strip()
 
     def get_area(self, entity):
-        try:
-            if entity.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                # We relax 'closed' for Site search but keep it for Building
-                if hasattr(entity, 'area'):
-                    return abs(entity.area) / self.scale_factor
-                vertices = [Vec2(v[:2]) for v in entity.get_points()]
-                return abs(ezdxf.math.area(vertices)) / self.scale_factor
-            return 0.0
-        except:
-            return 0.0
+        # We relax 'closed' for Site search but keep it for Building
+        # Only LWPOLYLINE is measured; POLYLINE (no get_points()) has always yielded 0.0
+        if entity.dxftype() == 'LWPOLYLINE':
+            return polygon_area(entity.get_points('xy')) / self.scale_factor
+        return 0.0
 
     def audit(self):
-        area_data = []
+        layers, areas = [], []  # Parallel columns, converted to arrays once collected
         materials = set()
-        keywords = ["마감", "유리", "콘크리트", "THK", "단열재", "방수", "내화"]
 
-        for entity in self.msp:
-            # 1. Geometry Collection
-            area = self.get_area(entity)
-            if area > 0.1: # Ignore tiny noise
-                area_data.append({'layer': entity.dxf.layer.upper(), 'area': area})
-            
-            # 2. Material Collection
-            if entity.dxftype() in ['TEXT', 'MTEXT']:
-                content = self.clean_text(entity.plain_text())
-                if any(kw in content for kw in keywords):
-                    materials.add(content)
+        # One pass; only polylines (geometry) and texts (materials) are decoded
+        if self.doc is not None:
+            dxf = None
+            entities = self.doc.modelspace().query('LWPOLYLINE TEXT MTEXT')
+        else:
+            dxf = iterdxf.opendxf(self.file_path)
+            entities = dxf.modelspace(types=['LWPOLYLINE', 'TEXT', 'MTEXT'])
+        
+        scale_factor = self.scale_factor
+        try:
+            for entity in entities:
+                if entity.dxftype() == 'LWPOLYLINE':
+                    # 1. Geometry Collection
+                    area = polygon_area(entity.get_points('xy')) / scale_factor
+                    if area > 0.1: # Ignore tiny noise
+                        layers.append(upper_layer(entity.dxf.layer))
+                        areas.append(area)
+                else:
+                    # 2. Material Collection
+                    content = self.clean_text(entity.plain_text())
+                    if self.MATERIAL_PATTERN.search(content):
+                        materials.add(content)
+        finally:
+            if dxf is not None:
+                dxf.close()
 
-        df = pd.DataFrame(area_data)
+        # A drawing yields few qualifying polylines, so plain arrays beat a DataFrame here
+        layers = np.array(layers, dtype=object)
+        areas = np.array(areas, dtype=np.float64)
 
         # --- LOGIC REPAIR ---
         
         # 1. SITE AREA: First try layers, then fallback to the ABSOLUTE MAX area.
-        site_df = df[df['layer'].isin(self.SITE_LAYERS)]
-        if not site_df.empty:
-            site_area = site_df['area'].max()
+        site_areas = areas[np.isin(layers, list(self.SITE_LAYERS))]
+        if site_areas.size:
+            site_area = site_areas.max()
             site_method = "Layer Match"
         else:
-            site_area = df['area'].max() # The Gemini Fallback
+            site_area = areas.max() if areas.size else 0.0 # The Gemini Fallback (no polylines: 0)
             site_method = "Largest Polyline Fallback"
 
         # 2. BUILDING AREA: Sum all polygons on building layers. 
         # If none found, look for the second largest distinct layer.
-        bldg_df = df[df['layer'].isin(self.BLDG_LAYERS)]
-        if not bldg_df.empty:
-            building_area = bldg_df['area'].sum()
+        bldg_areas = areas[np.isin(layers, list(self.BLDG_LAYERS))]
+        if bldg_areas.size:
+            building_area = bldg_areas.sum()
         else:
             # Fallback: Find the largest area that isn't the Site
-            building_area = df[df['area'] < site_area]['area'].max()
-            if pd.isna(building_area): building_area = 0
+            smaller = areas[areas < site_area]
+            building_area = smaller.max() if smaller.size else 0
 
         return {
             "site": site_area,
@@ -13,12 +13,13 @@ Examples:
     python llm_extractor.py files/house_3.dxf --mode both
 """
 
+import io
 import os
+import re
 import sys
 import json
 import argparse
 import tempfile
-import base64
 from pathlib import Path
 from dataclasses import dataclass
 from typing import Optional, Dict, Any, Tuple
@@ -38,14 +39,25 @@ GEMINI_MODEL = "gemini-2.5-flash"  # Using Gemini 2.5 Flash for best performance
 try:
     import ezdxf
     from ezdxf.addons.drawing import RenderContext, Frontend
+    from ezdxf.addons.drawing.backend import Backend
+    from ezdxf.addons.drawing.recorder import Recorder
     from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
+    from ezdxf.document import Drawing
+    from ezdxf.math import Matrix44
     import matplotlib.pyplot as plt
-    from ezdxf.math import Vec2
+    import numpy as np
+    from PIL import Image, ImageDraw
 except ImportError:
     print("ERROR: Required libraries not installed.")
-    print("Run: pip install ezdxf matplotlib")
+    print("Run: pip install ezdxf matplotlib Pillow")
     sys.exit(1)
 
+# ============================================================================
+# GEOMETRY HELPERS
+# ============================================================================
+
+from dxf_utils import measure_rings, polygon_area, upper_layer  # Shared with the audit scripts
+
 # ============================================================================
 # DATA CLASSES
 # ============================================================================
@@ -91,11 +103,14 @@ class ManualDXFParser:
     # Keywords for detecting different area types
     SITE_KEYWORDS = ['지적', 'SITE', '대지', 'LND', 'BOUNDARY', 'ETC']
     FOOTPRINT_KEYWORDS = ['HH', 'FOOTPRINT', '건축면적', 'BUILDING']
+    MATERIAL_KEYWORDS = ["마감", "유리", "콘크리트", "THK", "단열재", "방수", "석재", "타일"]
+    COLOR_LAYERS = frozenset(str(i) for i in range(1, 9))  # Numeric color layers, never floors
+    TEXT_TYPES = frozenset({'TEXT', 'MTEXT'})
     FLOOR_PATTERN = None  # Will be compiled in __init__
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, doc: Optional[Drawing] = None):
         self.file_path = file_path
-        self.doc = ezdxf.readfile(file_path)
+        self.doc = doc if doc is not None else ezdxf.readfile(file_path)
         self.msp = self.doc.modelspace()
         
         # Unit scaling
@@ -104,82 +119,76 @@ class ManualDXFParser:
         self.scale = 1_000_000 if self.units in [0, 4] else 1.0
         
         # Compile floor pattern
-        import re
-        self.FLOOR_PATTERN = re.compile(r'(B?\d+)(F|층|FLR|FLOOR|ND|ST|RD|TH)', re.IGNORECASE)
+        self.FLOOR_PATTERN = re.compile(r'(B?\d++)(F|층|FLR|FLOOR|ND|ST|RD|TH)', re.IGNORECASE)
+        # Keyword alternations so each layer column is matched in one vectorized scan
+        self.SITE_PATTERN = re.compile('|'.join(map(re.escape, self.SITE_KEYWORDS)))
+        self.FOOTPRINT_PATTERN = re.compile('|'.join(map(re.escape, self.FOOTPRINT_KEYWORDS)))
+        self.MATERIAL_PATTERN = re.compile('|'.join(map(re.escape, self.MATERIAL_KEYWORDS)))
     
     def _get_area(self, entity) -> float:
         """Calculate area of a DXF entity in m²"""
-        try:
-            if entity.dxftype() in ['LWPOLYLINE', 'POLYLINE']:
-                if hasattr(entity, 'area'):
-                    return abs(entity.area) / self.scale
-                vertices = [Vec2(v[:2]) for v in entity.get_points()]
-                if len(vertices) >= 3:
-                    return abs(ezdxf.math.area(vertices)) / self.scale
-            return 0.0
-        except Exception:
-            return 0.0
+        # POLYLINE lacks get_points() and previously failed into 0.0; keep that result explicitly
+        if entity.dxftype() == 'LWPOLYLINE':
+            return polygon_area(entity.get_points('xy')) / self.scale
+        return 0.0
     
     def extract(self) -> ExtractionResult:
         """Extract data from DXF file using manual parsing"""
-        import re
         
-        geometry_data = []
+        geometry_layers, geometry_areas = [], []  # Column lists for a column-wise DataFrame
         material_data = []
         layers = set()
         
-        mat_keywords = ["마감", "유리", "콘크리트", "THK", "단열재", "방수", "석재", "타일"]
-        
         for entity in self.msp:
             # Collect layers
-            layers.add(entity.dxf.layer)
+            layer = entity.dxf.layer
+            layers.add(layer)
+            etype = entity.dxftype()  # Looked up once; most entities are neither case below
             
-            # Extract geometry
-            area = self._get_area(entity)
-            if area > 0.05:  # Filter very small areas
-                geometry_data.append({
-                    'layer': entity.dxf.layer.upper(),
-                    'area': area
-                })
+            # Extract geometry (only LWPOLYLINE carries an area, see _get_area)
+            if etype == 'LWPOLYLINE':
+                area = self._get_area(entity)
+                if area > 0.05:  # Filter very small areas
+                    geometry_layers.append(upper_layer(layer))
+                    geometry_areas.append(area)
             
             # Extract materials from text
-            if entity.dxftype() in ['TEXT', 'MTEXT']:
+            elif etype in self.TEXT_TYPES:
                 try:
                     txt = entity.plain_text()
                     txt = re.sub(r'\\[A-Za-z][^;]*;', '', txt).strip()
-                    if any(k in txt for k in mat_keywords):
+                    if self.MATERIAL_PATTERN.search(txt):
                         material_data.append(txt)
                 except Exception:
                     pass
         
-        if not geometry_data:
+        if not geometry_areas:
             return ExtractionResult(method="manual", layers=list(layers))
         
         # Build DataFrame for analysis
         import pandas as pd
-        df = pd.DataFrame(geometry_data)
+        df = pd.DataFrame({'layer': geometry_layers, 'area': geometry_areas})
+        df['layer'] = df['layer'].astype('category')  # Layer masks and grouping run on category codes
         
         # Detect site area
-        site_mask = df['layer'].apply(lambda x: any(k in x for k in self.SITE_KEYWORDS))
-        site_area = df[site_mask]['area'].max() if any(site_mask) else df['area'].max()
+        site_mask = df['layer'].str.contains(self.SITE_PATTERN)
+        site_area = df[site_mask]['area'].max() if site_mask.any() else df['area'].max()
         
         # Detect footprint/building area
-        footprint_mask = df['layer'].apply(lambda x: any(k in x for k in self.FOOTPRINT_KEYWORDS))
-        footprint_area = df[footprint_mask]['area'].sum() if any(footprint_mask) else 0
-        
-        # Detect floor areas
-        floor_totals = {}
-        for layer in df['layer'].unique():
-            # Skip color layers (1-8)
-            if layer in [str(i) for i in range(1, 9)]:
-                continue
-                
-            match = self.FLOOR_PATTERN.search(layer)
-            if match:
-                floor_tag = f"{match.group(1)}F"
-                floor_totals[floor_tag] = floor_totals.get(floor_tag, 0) + df[df['layer'] == layer]['area'].sum()
-            elif "HH" in layer:
-                floor_totals["1F"] = floor_totals.get("1F", 0) + df[df['layer'] == layer]['area'].sum()
+        footprint_mask = df['layer'].str.contains(self.FOOTPRINT_PATTERN)
+        footprint_area = df[footprint_mask]['area'].sum() if footprint_mask.any() else 0
+        
+        # Detect floor areas: tag each layer's total with one vectorized regex
+        # scan, then sum the totals per floor tag (first-seen order is kept)
+        layer_totals = df.groupby('layer', sort=False, observed=True)['area'].sum()
+        layer_names = layer_totals.index.to_series().astype(str)
+        floor_tags = layer_names.str.extract(self.FLOOR_PATTERN)[0] + 'F'
+        # Layers without a floor number but with "HH" count toward the ground floor
+        floor_tags = floor_tags.mask(floor_tags.isna() & layer_names.str.contains('HH', regex=False), '1F')
+        # Skip color layers (1-8)
+        tagged = floor_tags.notna() & ~layer_names.isin(self.COLOR_LAYERS)
+        floor_totals = (layer_totals[tagged.to_numpy()]
+                        .groupby(floor_tags[tagged].to_numpy(), sort=False).sum().to_dict())
         
         total_floor_area = sum(floor_totals.values()) if floor_totals else footprint_area
         num_floors = len(floor_totals) if floor_totals else (1 if footprint_area > 0 else 0)
@@ -205,40 +214,145 @@ class ManualDXFParser:
 # DXF TO IMAGE CONVERTER
 # ============================================================================
 
-def dxf_to_image(dxf_path: str, output_path: str = None, dpi: int = 150) -> str:
+class PillowBackend(Backend):
+    """
+    Raster backend drawing straight onto a PIL image.
+    
+    ezdxf (>= 1.1) no longer ships a Pillow backend, and Matplotlib builds one
+    artist per entity, which takes tens of seconds on large drawings. Replayed
+    recordings must already be transformed to pixel coordinates (y down).
+    """
+    
+    FLATTENING_PX = 0.5  # Max deviation in pixels when flattening curves
+    
+    def __init__(self, image_size: Tuple[int, int], px_per_mm: float):
+        super().__init__()
+        self.image = Image.new('RGB', image_size, 'white')
+        self.draw = ImageDraw.Draw(self.image)
+        self.px_per_mm = px_per_mm
+    
+    def _style(self, properties):
+        # Drop any alpha suffix (#RRGGBBAA); the canvas is opaque RGB
+        width = max(1, round(properties.lineweight * self.px_per_mm))
+        return properties.color[:7], width
+    
+    def set_background(self, color) -> None:
+        self.draw.rectangle([(0, 0), self.image.size], fill=color[:7])
+    
+    def draw_point(self, pos, properties) -> None:
+        self.draw.point((pos.x, pos.y), fill=properties.color[:7])
+    
+    def draw_line(self, start, end, properties) -> None:
+        color, width = self._style(properties)
+        self.draw.line([(start.x, start.y), (end.x, end.y)], fill=color, width=width)
+    
+    def draw_solid_lines(self, lines, properties) -> None:
+        color, width = self._style(properties)
+        for start, end in lines:
+            self.draw.line([(start.x, start.y), (end.x, end.y)], fill=color, width=width)
+    
+    def draw_path(self, path, properties) -> None:
+        if len(path):
+            color, width = self._style(properties)
+            points = [(v.x, v.y) for v in path.flattening(distance=self.FLATTENING_PX)]
+            self.draw.line(points, fill=color, width=width)
+    
+    def draw_filled_paths(self, paths, properties) -> None:
+        for path in paths:
+            if len(path):
+                points = [(v.x, v.y) for v in path.flattening(distance=self.FLATTENING_PX)]
+                if len(points) > 2:
+                    self.draw.polygon(points, fill=properties.color[:7])
+    
+    def draw_filled_polygon(self, points, properties) -> None:
+        self.draw.polygon(points.np_vertices().ravel().tolist(), fill=properties.color[:7])
+    
+    def draw_image(self, image_data, properties) -> None:
+        pass  # Embedded raster images add little for the LLM and are skipped
+    
+    def clear(self) -> None:
+        self.draw.rectangle([(0, 0), self.image.size], fill='white')
+
+
+def render_with_pillow(doc, dpi: int) -> Image.Image:
+    """Render modelspace into a 16x12 inch palette image at `dpi` without Matplotlib"""
+    width, height = 16 * dpi, 12 * dpi
+    recorder = Recorder()
+    Frontend(RenderContext(doc), recorder).draw_layout(doc.modelspace(), finalize=True)
+    player = recorder.player()
+    
+    backend = PillowBackend((width, height), px_per_mm=dpi / 25.4)
+    bbox = player.bbox()
+    if bbox.has_data:
+        # Fit the drawing extents into the canvas (2% margin), flipping y for raster rows
+        size = bbox.size
+        scale = 0.96 * min(width / max(size.x, 1e-9), height / max(size.y, 1e-9))
+        center = bbox.center
+        player.transform(Matrix44.chain(
+            Matrix44.translate(-center.x, -center.y, 0),
+            Matrix44.scale(scale, -scale, 1),
+            Matrix44.translate(width / 2, height / 2, 0),
+        ))
+    player.replay(backend)
+    # Line work uses a handful of ACI colors, so a small adaptive palette loses
+    # nothing visible and shrinks the encoded upload to a fraction of the RGB one
+    return backend.image.quantize(colors=64)
+
+
+def figure_to_image(fig, dpi: int, **savefig_kwargs) -> Image.Image:
+    """Close a Matplotlib figure and return it as a PIL image, via an in-memory PNG"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=dpi, **savefig_kwargs)
+    plt.close(fig)
+    buf.seek(0)
+    image = Image.open(buf)
+    image.load()
+    return image
+
+
+def render_dxf(dxf_path: str, dpi: int = 64, use_matplotlib: bool = False,
+               doc: Optional[Drawing] = None) -> Image.Image:
     """
-    Convert DXF file to PNG image for LLM vision input.
+    Render a DXF file to an in-memory image for LLM vision input.
     
     Args:
         dxf_path: Path to DXF file
-        output_path: Output image path (auto-generated if None)
-        dpi: Image resolution
+        dpi: Image resolution; both backends draw a 16x12 inch canvas, so the
+             default 64 gives 1024x768, about what Gemini downscales to anyway
+             (larger renders only cost upload time and tokens)
+        use_matplotlib: Render with ezdxf's Matplotlib backend instead of Pillow
+        doc: Already loaded drawing of dxf_path, read from disk if None
         
     Returns:
-        Path to the generated image
+        PIL image of the drawing (a placeholder if rendering fails)
     """
-    if output_path is None:
-        output_path = tempfile.mktemp(suffix='.png')
-    
     try:
-        doc = ezdxf.readfile(dxf_path)
+        if doc is None:
+            doc = ezdxf.readfile(dxf_path)
+        if not use_matplotlib:
+            return render_with_pillow(doc, dpi)
+        
         msp = doc.modelspace()
         
         # Create figure
         fig = plt.figure(figsize=(16, 12), dpi=dpi)
         ax = fig.add_axes([0, 0, 1, 1])
         
-        # Render DXF
+        # Render DXF; keep the 16x12 figure instead of letting the backend refit it
+        # to the drawing's aspect, so both render paths give the same pixel size
         ctx = RenderContext(doc)
-        out = MatplotlibBackend(ax)
+        out = MatplotlibBackend(ax, adjust_figure=False)
         Frontend(ctx, out).draw_layout(msp, finalize=True)
         
-        # Save
-        fig.savefig(output_path, dpi=dpi, bbox_inches='tight', 
-                    facecolor='white', edgecolor='none')
-        plt.close(fig)
+        # Rasterize every artist in a single Agg pass. The axes fill the figure
+        # (the equal aspect widens the data limits, not the box), so a 'tight'
+        # bbox would only pad the 1024x768 target and cost a second full draw
+        for artist in ax.get_children():
+            artist.set_rasterized(True)
         
-        return output_path
+        # Low PNG compression: the buffer is decoded again right away
+        return figure_to_image(fig, dpi, facecolor='white', edgecolor='none',
+                               pil_kwargs={'optimize': False, 'compress_level': 1})
         
     except Exception as e:
         print(f"Warning: Could not render DXF to image: {e}")
@@ -247,168 +361,207 @@ def dxf_to_image(dxf_path: str, output_path: str = None, dpi: int = 150) -> str:
         ax.text(0.5, 0.5, f"DXF Rendering Failed\n{Path(dxf_path).name}", 
                 ha='center', va='center', fontsize=12)
         ax.axis('off')
-        fig.savefig(output_path, dpi=dpi)
-        plt.close(fig)
-        return output_path
+        return figure_to_image(fig, dpi)
 
-def image_to_base64(image_path: str) -> str:
-    """Convert image file to base64 string"""
-    with open(image_path, 'rb') as f:
-        return base64.b64encode(f.read()).decode('utf-8')
 
-def extract_elevation_data(dxf_path: str) -> Dict[str, Any]:
+def dxf_to_image(dxf_path: str, output_path: str = None, dpi: int = 64,
+                 use_matplotlib: bool = False, doc: Optional[Drawing] = None) -> str:
     """
-    Extract elevation/height data from DXF file by analyzing text entities.
-    
-    Looks for patterns like:
-    - EL+12500, EL +12500, EL=12500
-    - GL+2000, GL +2000
-    - +12.5m, +12500mm
-    - Level 1 +0.000, Level 2 +3.200
-    - 1F, 2F, B1F floor indicators
-    - 층고 (floor height), 높이 (height) annotations
+    Convert DXF file to a PNG file (see render_dxf for the arguments).
     
     Returns:
-        Dictionary with elevation data including max_height_m, floor_heights, etc.
+        Path to the generated image (a new temporary file if output_path is None)
+    """
+    if output_path is None:
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp:
+            output_path = tmp.name
+    render_dxf(dxf_path, dpi, use_matplotlib, doc).save(output_path, 'PNG', optimize=True)
+    return output_path
+
+# ============================================================================
+# ELEVATION PATTERNS
+# ============================================================================
+
+# Compiled once at import. The kinds are deliberately separate patterns rather than
+# one alternation: their matches may overlap (e.g. "E.L. 1FL+3000" is both an EL
+# and a FLOOR hit), and each kind must keep finding all of its own matches.
+ELEVATION_PATTERNS = [(re.compile(pattern, re.IGNORECASE), ptype) for pattern, ptype in [
+    # EL+12500, EL +12500, EL=12500, E.L.+12500
+    (r'E\.?L\.?\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'EL'),
+    # GL+2000, GL +2000
+    (r'GL\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'GL'),
+    # Level 1 +3.200, Level 2 +6.400
+    (r'Level\s*(\d+)\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'LEVEL'),
+    # +12500, +12.5 (standalone elevation markers)
+    (r'^\s*([+-]\d+(?:\.\d+)?)\s*$', 'STANDALONE'),
+    # 1FL +3200, 2F +6400, B1F -3000
+    (r'(B?\d+)\s*F(?:L|층)?\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'FLOOR'),
+    # Height annotations in Korean: 층고 3000, 높이 9000
+    (r'(?:층고|높이|H|height)\s*[=:]?\s*(\d+(?:\.\d+)?)', 'HEIGHT'),
+    # Roof level, TOP level
+    (r'(?:ROOF|TOP|지붕|옥상)\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'ROOF'),
+]]
+
+# Every pattern above needs at least one of these characters (a keyword letter in
+# either case, a sign, or a Korean keyword syllable); texts without any are skipped
+ELEVATION_KEY_CHARS = frozenset('ELGFHRTelgfhrt+-층높지옥')
+
+def _scan_modelspace(msp) -> Tuple[Dict[str, Any], Tuple[list, dict, list], list]:
     """
-    import re
+    Walk modelspace once, dispatching on entity type, and collect everything the
+    elevation and text-content helpers need.
     
-    try:
-        doc = ezdxf.readfile(dxf_path)
-        msp = doc.modelspace()
-        
-        elevation_values = []  # Store (value_in_mm, source_text)
-        floor_levels = {}  # floor_name -> elevation_mm
-        height_annotations = []  # Direct height annotations
-        
-        # Patterns to match elevation values
-        patterns = [
-            # EL+12500, EL +12500, EL=12500, E.L.+12500
-            (r'E\.?L\.?\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'EL'),
-            # GL+2000, GL +2000
-            (r'GL\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'GL'),
-            # Level 1 +3.200, Level 2 +6.400
-            (r'Level\s*(\d+)\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'LEVEL'),
-            # +12500, +12.5 (standalone elevation markers)
-            (r'^\s*([+-]\d+(?:\.\d+)?)\s*$', 'STANDALONE'),
-            # 1FL +3200, 2F +6400, B1F -3000
-            (r'(B?\d+)\s*F(?:L|층)?\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'FLOOR'),
-            # Height annotations in Korean: 층고 3000, 높이 9000
-            (r'(?:층고|높이|H|height)\s*[=:]?\s*(\d+(?:\.\d+)?)', 'HEIGHT'),
-            # Roof level, TOP level
-            (r'(?:ROOF|TOP|지붕|옥상)\s*[+=]?\s*([+-]?\d+(?:\.\d+)?)', 'ROOF'),
-        ]
-        
-        for entity in msp:
-            if entity.dxftype() in ['TEXT', 'MTEXT']:
-                try:
-                    txt = entity.plain_text().strip()
-                    if not txt:
-                        continue
-                    
-                    # Try each pattern
-                    for pattern, ptype in patterns:
-                        matches = re.finditer(pattern, txt, re.IGNORECASE)
-                        for match in matches:
-                            if ptype == 'LEVEL':
-                                level_num = match.group(1)
-                                value = float(match.group(2))
-                                floor_levels[f"Level {level_num}"] = value
-                                elevation_values.append((value, txt))
-                            elif ptype == 'FLOOR':
-                                floor_name = match.group(1) + 'F'
-                                value = float(match.group(2))
-                                floor_levels[floor_name] = value
-                                elevation_values.append((value, txt))
-                            elif ptype == 'HEIGHT':
-                                value = float(match.group(1))
-                                height_annotations.append((value, txt))
-                            elif ptype in ['EL', 'GL', 'STANDALONE', 'ROOF']:
-                                value = float(match.group(1))
-                                elevation_values.append((value, txt))
-                                if ptype == 'ROOF':
-                                    floor_levels['ROOF'] = value
-                                    
-                except Exception:
-                    pass
-        
-        # Process the collected data
-        result = {
-            'elevation_values': [],
-            'floor_levels': floor_levels,
-            'height_annotations': height_annotations,
-            'max_elevation_raw': None,
-            'min_elevation_raw': None,
-            'building_height_m': None,
-            'num_floors_detected': 0,
-        }
-        
-        if elevation_values:
-            # Get unique values sorted
-            unique_elevations = sorted(set(v[0] for v in elevation_values))
-            result['elevation_values'] = unique_elevations
-            result['max_elevation_raw'] = max(unique_elevations)
-            result['min_elevation_raw'] = min(unique_elevations)
-            
-            # Calculate building height
-            # If max value > 100, assume mm, otherwise assume meters
-            max_val = result['max_elevation_raw']
-            min_val = result['min_elevation_raw']
+    Returns:
+        (layer_info, (elevation_values, floor_levels, height_annotations), text_lines)
+    """
+    layer_info = {}  # layer -> {'types': {etype: count}, 'areas': [...]}
+    ring_layers, rings = [], []  # Polyline outlines, measured together after the walk
+    elevation_values = []  # Store (value_in_mm, source_text)
+    floor_levels = {}  # floor_name -> elevation_mm
+    height_annotations = []  # Direct height annotations
+    text_lines = []  # First 50 non-blank texts, already formatted for the LLM prompt
+    
+    for entity in msp:
+        layer = entity.dxf.layer
+        etype = entity.dxftype()
+        if layer not in layer_info:
+            layer_info[layer] = {'types': {}, 'areas': []}
+        layer_info[layer]['types'][etype] = layer_info[layer]['types'].get(etype, 0) + 1
+        
+        # Collect polyline outlines for the area pass (POLYLINE has no get_points()
+        # and has never contributed an area here)
+        if etype == 'LWPOLYLINE':
+            ring = np.asarray(entity.get_points('xy'), dtype=np.float64).reshape(-1, 2)
+            if len(ring):
+                ring_layers.append(layer)
+                rings.append(ring)
+        
+        elif etype == 'TEXT' or etype == 'MTEXT':
+            try:
+                raw = entity.plain_text()
+            except Exception:
+                continue
+            txt = raw.strip()
+            if not txt:
+                continue
+            if len(text_lines) < 50:
+                text_lines.append(f"  [{layer}] {raw[:100]}")
             
-            # Height is difference between max and min (or max if min is 0/ground level)
-            if min_val < 0:
-                # Has basement, height from min to max
-                height_raw = max_val - min_val
-            else:
-                # No basement or min is ground level
-                height_raw = max_val
+            if ELEVATION_KEY_CHARS.isdisjoint(txt):
+                continue
             
-            # Convert to meters if needed
-            if abs(height_raw) > 100:
-                result['building_height_m'] = height_raw / 1000.0
-            else:
-                result['building_height_m'] = height_raw
-        
-        # Count floors from floor_levels
-        if floor_levels:
-            result['num_floors_detected'] = len(floor_levels)
-        
-        # If we have height annotations but no elevation values, use those
-        if not result['building_height_m'] and height_annotations:
-            max_height = max(h[0] for h in height_annotations)
-            if max_height > 100:
-                result['building_height_m'] = max_height / 1000.0
-            else:
-                result['building_height_m'] = max_height
-        
-        return result
+            try:
+                # Try each pattern
+                for pattern, ptype in ELEVATION_PATTERNS:
+                    for match in pattern.finditer(txt):
+                        if ptype == 'LEVEL':
+                            level_num = match.group(1)
+                            value = float(match.group(2))
+                            floor_levels[f"Level {level_num}"] = value
+                            elevation_values.append((value, txt))
+                        elif ptype == 'FLOOR':
+                            floor_name = match.group(1) + 'F'
+                            value = float(match.group(2))
+                            floor_levels[floor_name] = value
+                            elevation_values.append((value, txt))
+                        elif ptype == 'HEIGHT':
+                            value = float(match.group(1))
+                            height_annotations.append((value, txt))
+                        elif ptype in ['EL', 'GL', 'STANDALONE', 'ROOF']:
+                            value = float(match.group(1))
+                            elevation_values.append((value, txt))
+                            if ptype == 'ROOF':
+                                floor_levels['ROOF'] = value
+                                
+            except Exception:
+                pass
+    
+    # Calculate area for polylines
+    for layer, area in zip(ring_layers, measure_rings(rings).tolist()):
+        if area > 100:  # Filter tiny areas
+            layer_info[layer]['areas'].append(area)
+    
+    return layer_info, (elevation_values, floor_levels, height_annotations), text_lines
+
+
+def _summarize_elevations(elevation_values: list, floor_levels: dict, height_annotations: list) -> Dict[str, Any]:
+    """Turn the raw elevation hits collected by _scan_modelspace into the elevation result"""
+    # Process the collected data
+    result = {
+        'elevation_values': [],
+        'floor_levels': floor_levels,
+        'height_annotations': height_annotations,
+        'max_elevation_raw': None,
+        'min_elevation_raw': None,
+        'building_height_m': None,
+        'num_floors_detected': 0,
+    }
+    
+    if elevation_values:
+        # Get unique values sorted (one C-level sort over a float64 array); the
+        # ends of the sorted run are the extremes
+        unique_elevations = np.unique(np.fromiter((v[0] for v in elevation_values),
+                                                  dtype=np.float64, count=len(elevation_values))).tolist()
+        result['elevation_values'] = unique_elevations
+        result['max_elevation_raw'] = unique_elevations[-1]
+        result['min_elevation_raw'] = unique_elevations[0]
+        
+        # Calculate building height
+        # If max value > 100, assume mm, otherwise assume meters
+        max_val = result['max_elevation_raw']
+        min_val = result['min_elevation_raw']
+        
+        # Height is difference between max and min (or max if min is 0/ground level)
+        if min_val < 0:
+            # Has basement, height from min to max
+            height_raw = max_val - min_val
+        else:
+            # No basement or min is ground level
+            height_raw = max_val
         
-    except Exception as e:
-        return {
-            'error': str(e),
-            'building_height_m': None,
-            'num_floors_detected': 0,
-        }
+        # Convert to meters if needed
+        if abs(height_raw) > 100:
+            result['building_height_m'] = height_raw / 1000.0
+        else:
+            result['building_height_m'] = height_raw
+    
+    # Count floors from floor_levels
+    if floor_levels:
+        result['num_floors_detected'] = len(floor_levels)
+    
+    # If we have height annotations but no elevation values, use those
+    if not result['building_height_m'] and height_annotations:
+        max_height = max(h[0] for h in height_annotations)
+        if max_height > 100:
+            result['building_height_m'] = max_height / 1000.0
+        else:
+            result['building_height_m'] = max_height
+    
+    return result
 
 
-def extract_dxf_text_content(dxf_path: str, max_lines: int = 500) -> str:
+def _analyze_dxf(dxf_path: str, max_lines: int = 500,
+                 doc: Optional[Drawing] = None) -> Tuple[str, Dict[str, Any]]:
     """
-    Extract text representation of DXF content for LLM context.
+    Read the DXF (unless an already loaded doc is given) and scan its modelspace
+    once, producing both the LLM text content and the elevation data.
     
     Returns:
-        String containing DXF structure and key data
+        (text_content, elevation_data)
     """
     try:
-        doc = ezdxf.readfile(dxf_path)
+        if doc is None:
+            doc = ezdxf.readfile(dxf_path)
         msp = doc.modelspace()
+        layer_info, elevation_hits, text_lines = _scan_modelspace(msp)
         
         lines = []
         lines.append(f"=== DXF FILE ANALYSIS: {Path(dxf_path).name} ===")
         lines.append(f"Units: {doc.header.get('$INSUNITS', 'Unknown')}")
         lines.append("")
         
-        # Extract elevation data first
-        elevation_data = extract_elevation_data(dxf_path)
+        # Elevation data first
+        elevation_data = _summarize_elevations(*elevation_hits)
         lines.append("=== ELEVATION/HEIGHT DATA ===")
         if elevation_data.get('building_height_m'):
             lines.append(f"Calculated Building Height: {elevation_data['building_height_m']:.2f} m")
@@ -423,26 +576,6 @@ def extract_dxf_text_content(dxf_path: str, max_lines: int = 500) -> str:
             lines.append(f"Min Elevation (raw): {elevation_data['min_elevation_raw']}")
         lines.append("")
         
-        # Collect layers and their entity counts
-        layer_info = {}
-        for entity in msp:
-            layer = entity.dxf.layer
-            etype = entity.dxftype()
-            if layer not in layer_info:
-                layer_info[layer] = {'types': {}, 'areas': []}
-            layer_info[layer]['types'][etype] = layer_info[layer]['types'].get(etype, 0) + 1
-            
-            # Calculate area for polylines
-            if etype in ['LWPOLYLINE', 'POLYLINE']:
-                try:
-                    vertices = [Vec2(v[:2]) for v in entity.get_points()]
-                    if len(vertices) >= 3:
-                        area = abs(ezdxf.math.area(vertices))
-                        if area > 100:  # Filter tiny areas
-                            layer_info[layer]['areas'].append(area)
-                except:
-                    pass
-        
         lines.append("=== LAYERS AND GEOMETRY ===")
         for layer, info in sorted(layer_info.items()):
             lines.append(f"\nLayer: {layer}")
@@ -450,23 +583,46 @@ def extract_dxf_text_content(dxf_path: str, max_lines: int = 500) -> str:
             if info['areas']:
                 lines.append(f"  Areas (raw units): {sorted(info['areas'], reverse=True)[:5]}")
         
-        # Extract text entities
+        # Text entities
         lines.append("\n=== TEXT CONTENT ===")
-        text_count = 0
-        for entity in msp:
-            if entity.dxftype() in ['TEXT', 'MTEXT'] and text_count < 50:
-                try:
-                    txt = entity.plain_text()
-                    if txt.strip():
-                        lines.append(f"  [{entity.dxf.layer}] {txt[:100]}")
-                        text_count += 1
-                except:
-                    pass
+        lines.extend(text_lines)
         
-        return "\n".join(lines[:max_lines])
+        return "\n".join(lines[:max_lines]), elevation_data
         
     except Exception as e:
-        return f"Error reading DXF: {e}"
+        return f"Error reading DXF: {e}", {
+            'error': str(e),
+            'building_height_m': None,
+            'num_floors_detected': 0,
+        }
+
+
+def extract_elevation_data(dxf_path: str, doc: Optional[Drawing] = None) -> Dict[str, Any]:
+    """
+    Extract elevation/height data from DXF file by analyzing text entities.
+    
+    Looks for patterns like:
+    - EL+12500, EL +12500, EL=12500
+    - GL+2000, GL +2000
+    - +12.5m, +12500mm
+    - Level 1 +0.000, Level 2 +3.200
+    - 1F, 2F, B1F floor indicators
+    - 층고 (floor height), 높이 (height) annotations
+    
+    Returns:
+        Dictionary with elevation data including max_height_m, floor_heights, etc.
+    """
+    return _analyze_dxf(dxf_path, doc=doc)[1]
+
+
+def extract_dxf_text_content(dxf_path: str, max_lines: int = 500, doc: Optional[Drawing] = None) -> str:
+    """
+    Extract text representation of DXF content for LLM context.
+    
+    Returns:
+        String containing DXF structure and key data
+    """
+    return _analyze_dxf(dxf_path, max_lines, doc)[0]
 
 # ============================================================================
 # LLM EXTRACTOR (Gemini API)
@@ -475,6 +631,8 @@ def extract_dxf_text_content(dxf_path: str, max_lines: int = 500) -> str:
 class LLMExtractor:
     """Extract data from DXF using Gemini API with multi-modal input"""
     
+    JSON_DECODER = json.JSONDecoder()  # raw_decode() locates unfenced JSON in replies
+    
     EXTRACTION_PROMPT = """You are an expert architectural CAD analyst. Analyze this DXF file and its rendered image.
 
 I need you to extract the following information from this architectural drawing:
@@ -546,39 +704,38 @@ Look for these patterns in the text entities:
                 "Get your API key from: https://aistudio.google.com/app/apikey"
             )
     
-    def extract(self, dxf_path: str) -> ExtractionResult:
-        """Extract data from DXF using LLM"""
+    def extract(self, dxf_path: str, doc: Optional[Drawing] = None) -> ExtractionResult:
+        """Extract data from DXF using LLM (doc: already loaded drawing of dxf_path, if any)"""
         
-        # Generate image from DXF
-        print("  Converting DXF to image...")
-        image_path = dxf_to_image(dxf_path)
+        # Parse the DXF once for both the render and the text scan. If it cannot be
+        # read, each helper below hits the same error and handles it as before.
+        if doc is None:
+            try:
+                doc = ezdxf.readfile(dxf_path)
+            except Exception:
+                pass
         
-        # Extract text content from DXF (includes elevation data)
-        print("  Extracting DXF text content...")
-        dxf_content = extract_dxf_text_content(dxf_path)
+        # Generate image from DXF (kept in memory; the SDK encodes it for upload)
+        print("  Converting DXF to image...")
+        image = render_dxf(dxf_path, doc=doc)
         
-        # Also get elevation data directly for fallback
-        print("  Extracting elevation data...")
-        elevation_data = extract_elevation_data(dxf_path)
+        # Extract text content from DXF (includes elevation data); the same scan
+        # also yields the elevation data used as fallback
+        print("  Extracting DXF text content and elevation data...")
+        dxf_content, elevation_data = _analyze_dxf(dxf_path, doc=doc)
         
         # Prepare prompt
         prompt = self.EXTRACTION_PROMPT.format(dxf_content=dxf_content)
         
         # Call Gemini API
-        response = self._call_gemini(prompt, image_path)
+        response = self._call_gemini(prompt, image)
         
         # Parse response
         result = self._parse_response(response, elevation_data)
         
-        # Cleanup temp image
-        try:
-            os.unlink(image_path)
-        except:
-            pass
-        
         return result
     
-    def _call_gemini(self, prompt: str, image_path: str) -> str:
+    def _call_gemini(self, prompt: str, image: Image.Image) -> str:
         """Call Gemini API with image and text"""
         try:
             import google.generativeai as genai
@@ -592,10 +749,6 @@ Look for these patterns in the text entities:
         genai.configure(api_key=self.api_key)
         model = genai.GenerativeModel(GEMINI_MODEL)
         
-        # Load image
-        import PIL.Image
-        image = PIL.Image.open(image_path)
-        
         # Generate response
         response = model.generate_content([prompt, image])
         
@@ -603,16 +756,24 @@ Look for these patterns in the text entities:
     
     def _parse_response(self, response: str, elevation_data: Dict[str, Any] = None) -> ExtractionResult:
         """Parse LLM response JSON with fallback to extracted elevation data"""
-        import re
         
         # Extract JSON from response
         json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
         if json_match:
             json_str = json_match.group(1)
         else:
-            # Try to find raw JSON
-            json_match = re.search(r'\{[^{}]*\}', response, re.DOTALL)
-            json_str = json_match.group(0) if json_match else "{}"
+            # Try to find raw JSON: decode from each '{' in turn, so nested objects and
+            # braces inside string values are delimited by the JSON parser itself
+            json_str = "{}"
+            start = response.find('{')
+            while start != -1:
+                try:
+                    _, end = self.JSON_DECODER.raw_decode(response, start)
+                except json.JSONDecodeError:
+                    start = response.find('{', start + 1)
+                else:
+                    json_str = response[start:end]
+                    break
         
         try:
             data = json.loads(json_str)
@@ -783,12 +944,14 @@ Get your API key from: https://aistudio.google.com/app/apikey
         print(f"LLM:  Gemini ({GEMINI_MODEL})")
     
     results = {}
+    doc = None  # Drawing loaded by the manual parser, reused by the LLM extraction
     
     # Manual extraction
     if args.mode in ["manual", "both"]:
         print("\n[1/2] Running MANUAL extraction..." if args.mode == "both" else "\nRunning MANUAL extraction...")
         try:
             manual_parser = ManualDXFParser(args.dxf_file)
+            doc = manual_parser.doc
             manual_result = manual_parser.extract()
             results["manual"] = manual_result
             
@@ -804,7 +967,7 @@ Get your API key from: https://aistudio.google.com/app/apikey
         try:
             api_key = args.api_key or GEMINI_API_KEY
             llm_extractor = LLMExtractor(api_key=api_key)
-            llm_result = llm_extractor.extract(args.dxf_file)
+            llm_result = llm_extractor.extract(args.dxf_file, doc=doc)
             results["llm"] = llm_result
             
             if args.mode == "llm":